@@ -2,6 +2,28 @@
 import os
 from . propertybag import *
 
+''' Names imported from their module on first use, see __getattr__()
+'''
+_lazy = {
+    'BagTable': 'bagtable',
+    'BagRow': 'bagtable',
+    'LazyBag': 'lazy',
+    'PersistentBag': 'persist',
+    'InternTable': 'intern',
+    'load_many': 'bulk',
+    'loadMany': 'bulk',
+    'CacheBag': 'cache',
+    'load_file': 'loaders',
+    'loadFile': 'loaders',
+    'load_env': 'loaders',
+    'loadEnv': 'loaders',
+}
+
+''' Submodules imported on first use
+'''
+_submodules = ('bagtable', 'bulk', 'cache', 'computed', 'fingerprint', 'instrument', 'intern', 'lazy', 'loaders',
+               'persist', 'transaction', 'tree')
+
 def loadConfig(fname):
     globals()["__info__"] = {}
     with open(fname) as f:
@@ -13,5 +35,23 @@ def loadConfig(fname):
                 globals()["__%s__"%k] = " ".join(parts).strip()
                 globals()["__info__"][k] = " ".join(parts).strip()
 
-loadConfig(os.path.join(os.path.dirname(__file__), 'PROJECT.txt'))
+''' Imports classes, functions and submodules on first use, and reads
+    __version__ and the other PROJECT.txt values the first time one is
+    needed, which keeps 'import propertybag' cheap.
+'''
+def __getattr__(name):
+    import importlib
+    g = globals()
+    if name in _lazy:
+        g[name] = getattr(importlib.import_module('.' + _lazy[name], __name__), name)
+        return g[name]
+    if name in _submodules:
+        return importlib.import_module('.' + name, __name__)
+    if name.startswith('__') and name.endswith('__') and '__info__' not in g:
+        loadConfig(os.path.join(os.path.dirname(__file__), 'PROJECT.txt'))
+        if name in g:
+            return g[name]
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
+def __dir__():
+    return sorted(set(globals()) | set(_lazy) | set(_submodules))
@@ -0,0 +1,684 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import sys
+import json
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . propertybag import Bag, PlaceHolder
+from . intern import resolve as resolveIntern
+
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+
+
+#==================================================================================================
+''' class _Column
+
+    Storage for a single leaf path of a BagTable.
+
+    kind is 'q' (int64 array), 'd' (double array) or 'o' (python list).
+    mask is None while every row has a value, otherwise a bytearray
+    with a non-zero byte for each row that has a value.
+'''
+class _Column():
+
+    def __init__(self, n):
+        self.kind = None
+        self.data = [None] * n
+        self.mask = bytearray(n) if n else None
+
+    ''' Returns True if row i has a value
+        @param [in] i   - Row index
+    '''
+    def has(self, i):
+        return self.mask is None or 0 != self.mask[i]
+
+    ''' Returns the value stored for row i
+        @param [in] i   - Row index
+    '''
+    def value(self, i):
+        return self.data[i]
+
+    ''' Converts the column to a python list
+    '''
+    def demote(self):
+        if 'o' != self.kind:
+            self.data = self.data.tolist() if isinstance(self.data, array) else self.data
+            if self.mask is not None:
+                for i, m in enumerate(self.mask):
+                    if not m:
+                        self.data[i] = None
+            self.kind = 'o'
+
+    ''' Returns the storage kind for a value
+        @param [in] v   - Value
+    '''
+    @staticmethod
+    def kindOf(v):
+        t = type(v)
+        if t is int:
+            return 'q' if _INT_MIN <= v <= _INT_MAX else 'o'
+        if t is float:
+            return 'd'
+        return 'o'
+
+    ''' Prepares value for storage in this column
+        @param [in] v   - Value
+    '''
+    def prepare(self, v):
+        k = self.kindOf(v)
+        if self.kind is None:
+            self.kind = k
+            if 'o' != k:
+                fill = 0 if 'q' == k else 0.0
+                self.data = array(k, [fill]) * len(self.data)
+        elif k != self.kind:
+            self.demote()
+        if 'o' == self.kind and type(v) is str:
+            v = sys.intern(v)
+        return v
+
+    ''' Appends a value
+        @param [in] v   - Value
+    '''
+    def append(self, v):
+        v = self.prepare(v)
+        self.data.append(v)
+        if self.mask is not None:
+            self.mask.append(1)
+
+    ''' Appends a missing value
+    '''
+    def skip(self):
+        n = len(self.data)
+        if self.mask is None:
+            self.mask = bytearray(b'\x01') * n
+        self.mask.append(0)
+        if 'q' == self.kind:
+            self.data.append(0)
+        elif 'd' == self.kind:
+            self.data.append(0.0)
+        else:
+            self.data.append(None)
+
+    ''' Sets the value for row i
+        @param [in] i   - Row index
+        @param [in] v   - Value
+    '''
+    def put(self, i, v):
+        v = self.prepare(v)
+        self.data[i] = v
+        if self.mask is not None:
+            self.mask[i] = 1
+
+    ''' Clears the value for row i
+        @param [in] i   - Row index
+    '''
+    def clear(self, i):
+        if self.mask is None:
+            self.mask = bytearray(b'\x01') * len(self.data)
+        self.mask[i] = 0
+        if 'o' == self.kind or self.kind is None:
+            self.data[i] = None
+
+    ''' Returns a new column holding the specified rows
+        @param [in] idx - List of row indexes
+    '''
+    def take(self, idx):
+        c = _Column(0)
+        c.kind = self.kind
+        d = self.data
+        if isinstance(d, array):
+            c.data = array(self.kind, [d[i] for i in idx])
+        else:
+            c.data = [d[i] for i in idx]
+        if self.mask is not None:
+            m = self.mask
+            c.mask = bytearray(m[i] for i in idx)
+            if all(c.mask):
+                c.mask = None
+        return c
+
+
+#==================================================================================================
+''' class _RowWriter
+
+    Lets a PlaceHolder returned by a row view write back into the table.
+'''
+class _RowWriter():
+
+    def __init__(self, table, i, prefix):
+        self.table = table
+        self.i = i
+        self.prefix = prefix
+
+    def __getitem__(self, k):
+        return _RowWriter(self.table, self.i, self.prefix + (k,))
+
+    def __setitem__(self, k, v):
+        if isinstance(v, dict) and not v:
+            return
+        self.table.setValue(self.i, self.prefix + (k,), v)
+
+
+#==================================================================================================
+''' class BagRow
+
+    Lightweight view of a single BagTable row.
+
+    Supports the same attribute, index, get(), bag() and exists()
+    access as Bag without materializing the row.
+'''
+class BagRow():
+
+    ''' Constructor
+        @param [in] table   - BagTable the row belongs to
+        @param [in] i       - Row index
+        @param [in] prefix  - Key path of this view inside the row
+    '''
+    def __init__(self, table, i, prefix=()):
+        self.__dict__['table'] = table
+        self.__dict__['i'] = i
+        self.__dict__['prefix'] = prefix
+
+    ''' Returns the value at the specified key path or the miss object
+        @param [in] path    - Key path tuple
+        @param [in] miss    - Returned when path does not exist
+    '''
+    def _lookup(self, path, miss):
+        t = self.__dict__['table']
+        i = self.__dict__['i']
+        c = t.cols.get(path)
+        if c is not None and c.has(i):
+            return c.value(i)
+        if t.hasPrefix(i, path):
+            return BagRow(t, i, path)
+        return miss
+
+    ''' Splits a compound key into a key path tuple
+    '''
+    def _path(self, ks, sep):
+        if not isinstance(ks, str):
+            return self.__dict__['prefix'] + (ks,)
+        return self.__dict__['prefix'] + tuple(ks.split(sep))
+
+    def _missing(self, k):
+        t = self.__dict__['table']
+        w = _RowWriter(t, self.__dict__['i'], self.__dict__['prefix'])
+        return PlaceHolder(w, k, t.defstr, t.defval)
+
+    ''' Get attribute operator
+        @param [in] k   - Attribute name
+    '''
+    def __getattr__(self, k):
+        r = self._lookup(self.__dict__['prefix'] + (k,), _MISS)
+        return self._missing(k) if r is _MISS else r
+
+    ''' Index operator
+        @param [in] k   - Key to return
+    '''
+    def __getitem__(self, k):
+        r = self._lookup(self.__dict__['prefix'] + (k,), _MISS)
+        return self._missing(k) if r is _MISS else r
+
+    ''' Set attribute operator
+        @param [in] k   - Attribute name
+        @param [in] v   - Attribute value to set
+    '''
+    def __setattr__(self, k, v):
+        self.__dict__['table'].setValue(self.__dict__['i'], self.__dict__['prefix'] + (k,), v)
+
+    __setitem__ = __setattr__
+
+    ''' Contains operator
+        @param [in] k   - Key to check
+    '''
+    def __contains__(self, k):
+        return self._lookup(self.__dict__['prefix'] + (k,), _MISS) is not _MISS
+
+    ''' Key iterator
+    '''
+    def __iter__(self):
+        return iter(self.keys())
+
+    ''' Length operator
+    '''
+    def __len__(self):
+        return len(self.keys())
+
+    ''' Equality operator
+    '''
+    def __eq__(self, other):
+        if isinstance(other, BagRow):
+            return self.as_dict() == other.as_dict()
+        elif isinstance(other, Bag):
+            return self.as_dict() == other.as_dict()
+        elif isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        r = self.__eq__(other)
+        return r if r is NotImplemented else not r
+
+    ''' String cast
+    '''
+    def __str__(self):
+        return json.dumps(self.as_dict())
+
+    ''' Object declaration cast
+    '''
+    def __repr__(self):
+        items = (f"{k}={v!r}" for k, v in self.as_dict().items())
+        return "{}({})".format(type(self).__name__, ", ".join(items))
+
+    ''' Returns the keys present in this row at this level
+    '''
+    def keys(self):
+        t = self.__dict__['table']
+        i = self.__dict__['i']
+        p = self.__dict__['prefix']
+        return [k for k in t.children.get(p, ()) if self._lookup(p + (k,), _MISS) is not _MISS]
+
+    ''' Returns the (key, value) pairs present in this row at this level
+    '''
+    def items(self):
+        p = self.__dict__['prefix']
+        return [(k, self._lookup(p + (k,), None)) for k in self.keys()]
+
+    ''' Returns the values present in this row at this level
+    '''
+    def values(self):
+        return [v for k, v in self.items()]
+
+    ''' Get value using compound key
+        @param [in] ks      - Compound key
+        @param [in] defval  - Default value
+        @param [in] sep     - Key separator
+
+        Same as Bag.get(), nested values are returned as dict
+    '''
+    def get(self, ks, defval=None, sep='.'):
+        if isinstance(ks, str) and not ks:
+            return self.as_dict()
+        r = self._lookup(self._path(ks, sep), _MISS)
+        if r is _MISS:
+            return defval
+        if isinstance(r, BagRow):
+            return r.as_dict()
+        return r
+
+    ''' Get propertybag using compound key
+        @param [in] ks      - Compound key
+        @param [in] defval  - Default value
+        @param [in] sep     - Key separator
+
+        Same as Bag.bag(), nested values are returned as Bag
+    '''
+    def bag(self, ks, defval=None, sep='.'):
+        r = self.get(ks, _MISS, sep)
+        if r is _MISS:
+            return defval
+        if isinstance(r, dict):
+            return Bag(r)
+        return r
+
+    ''' Return True if key exists, else False
+        @param [in] ks      - Compound key
+        @param [in] sep     - Key separator
+    '''
+    def exists(self, ks, sep='.'):
+        if isinstance(ks, str) and not ks:
+            return False
+        return self._lookup(self._path(ks, sep), _MISS) is not _MISS
+
+    ''' Set value using compound key
+        @param [in] ks      - Compound key
+        @param [in] val     - New value to set
+        @param [in] sep     - Key separator
+    '''
+    def set(self, ks, val, sep='.'):
+        self.__dict__['table'].setValue(self.__dict__['i'], self._path(ks, sep), val)
+        return val
+
+    ''' Return the row as dict
+    '''
+    def as_dict(self):
+        return self.__dict__['table'].rowDict(self.__dict__['i'], self.__dict__['prefix'])
+
+    ''' Return the row as a Bag
+    '''
+    def to_bag(self):
+        return Bag(self.as_dict())
+
+    toBag = to_bag
+
+
+_MISS = object()
+
+
+#==================================================================================================
+''' class BagTable
+
+    Column oriented storage for many Bags with the same shape.
+
+    Every leaf key path gets its own column. Integer and float columns are
+    stored in array.array (and handed out as numpy arrays when numpy is
+    installed), everything else in a list with strings interned.
+
+    @begincode
+
+        t = pb.BagTable([{'a': {'b': 1}, 'c': 'x'}, {'a': {'b': 2}, 'c': 'y'}])
+        print(t[1].a.b)                 # > 2
+        print(t.column('a.b'))          # > array('q', [1, 2])
+        print(t.filter('a.b', lambda v: v > 1).to_bags())
+
+    @endcode
+'''
+class BagTable():
+
+    ''' Constructor
+        @param [in] rows    - Iterable of dict / Bag objects to load
+        @param [in] defstr  - Default string value for missing row attributes
+        @param [in] defval  - Default value for missing row attributes
+    '''
+    def __init__(self, rows=None, defstr=ValueError, defval=None):
+        self.n = 0
+        self.cols = {}
+        self.children = {}
+        self.under = {}
+        self.defstr = defstr
+        self.defval = defval
+        if rows is not None:
+            self.extend(rows)
+
+    ''' Creates a new column for the specified key path
+        @param [in] path    - Key path tuple
+    '''
+    def _addColumn(self, path):
+        c = _Column(self.n)
+        self.cols[path] = c
+        for j in range(len(path)):
+            p = path[:j]
+            self.children.setdefault(p, {})[path[j]] = None
+            self.under.setdefault(p, []).append(path)
+        return c
+
+    ''' Returns True if any column below path has a value for row i
+        @param [in] i       - Row index
+        @param [in] path    - Key path tuple
+    '''
+    def hasPrefix(self, i, path):
+        for p in self.under.get(path, ()):
+            if self.cols[p].has(i):
+                return True
+        return False
+
+    ''' Flattens a dict into (path, value) pairs
+        @param [in] d       - dict to flatten
+        @param [in] prefix  - Key path of d
+    '''
+    @staticmethod
+    def flatten(d, prefix=()):
+        stack = [(prefix, iter(d.items()))]
+        while stack:
+            p, it = stack[-1]
+            for k, v in it:
+                if isinstance(v, Bag):
+                    v = v.as_dict()
+                if isinstance(v, dict) and v:
+                    stack.append((p + (k,), iter(v.items())))
+                    break
+                yield p + (k,), v
+            else:
+                stack.pop()
+
+    ''' Appends a row
+        @param [in] row     - dict or Bag
+    '''
+    def append(self, row):
+        if isinstance(row, (Bag, BagRow)):
+            row = row.as_dict()
+        n = self.n
+        cols = self.cols
+        for p, v in self.flatten(row):
+            c = cols.get(p)
+            if c is None:
+                c = self._addColumn(p)
+            if len(c.data) > n:
+                continue
+            c.append(v)
+        self.n = n = n + 1
+        for c in cols.values():
+            if len(c.data) < n:
+                c.skip()
+
+    ''' Appends multiple rows
+        @param [in] rows    - Iterable of dict or Bag objects
+    '''
+    def extend(self, rows):
+        for r in rows:
+            self.append(r)
+
+    ''' Sets a value in a row
+        @param [in] i       - Row index
+        @param [in] path    - Key path tuple
+        @param [in] v       - New value
+    '''
+    def setValue(self, i, path, v):
+        if isinstance(v, Bag):
+            v = v.as_dict()
+        for p in self.under.get(path, ()):
+            self.cols[p].clear(i)
+        for j in range(1, len(path)):
+            c = self.cols.get(path[:j])
+            if c is not None and c.has(i):
+                c.clear(i)
+        if isinstance(v, dict) and v:
+            for p, sv in self.flatten(v, path):
+                self.setValue(i, p, sv)
+            return
+        c = self.cols.get(path)
+        if c is None:
+            c = self._addColumn(path)
+        c.put(i, v)
+
+    ''' Returns row i as dict
+        @param [in] i       - Row index
+        @param [in] prefix  - Only return values below this key path
+    '''
+    def rowDict(self, i, prefix=()):
+        r = {}
+        paths = self.under.get(prefix, ()) if prefix else self.cols.keys()
+        n = len(prefix)
+        for p in paths:
+            c = self.cols[p]
+            if not c.has(i):
+                continue
+            v = c.value(i)
+            d = r
+            for k in p[n:-1]:
+                d = d.setdefault(k, {})
+            d[p[-1]] = dict() if isinstance(v, dict) else v
+        return r
+
+    ''' Length operator
+    '''
+    def __len__(self):
+        return self.n
+
+    ''' Index operator
+        @param [in] i   - Row index or slice
+    '''
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(range(*i.indices(self.n)))
+        if 0 > i:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError('Row index out of range : %s'%i)
+        return BagRow(self, i)
+
+    ''' Row iterator
+    '''
+    def __iter__(self):
+        for i in range(self.n):
+            yield BagRow(self, i)
+
+    ''' Returns the column names as compound keys
+        @param [in] sep     - Key separator
+    '''
+    def columns(self, sep='.'):
+        return [sep.join(str(k) for k in p) for p in self.cols]
+
+    ''' Returns all values for a compound key
+        @param [in] ks      - Compound key
+        @param [in] default - Value used for rows missing the key
+        @param [in] sep     - Key separator
+
+        Numeric columns without missing values are returned as a numpy
+        array if numpy is installed, else as an array.array copy.
+        Everything else is returned as a list.
+    '''
+    def column(self, ks, default=None, sep='.'):
+        p = tuple(ks.split(sep)) if isinstance(ks, str) else (ks,)
+        c = self.cols.get(p)
+        if c is None:
+            return [default] * self.n
+        if isinstance(c.data, array) and c.mask is None:
+            if numpy is not None:
+                return numpy.array(c.data)
+            return array(c.kind, c.data)
+        if c.mask is None:
+            return list(c.data)
+        return [v if m else default for v, m in zip(c.data, c.mask)]
+
+    ''' Returns a new table holding only the specified rows
+        @param [in] idx     - Iterable of row indexes
+    '''
+    def take(self, idx):
+        idx = list(idx)
+        t = BagTable(defstr=self.defstr, defval=self.defval)
+        for p, c in self.cols.items():
+            t._addColumn(p)
+            t.cols[p] = c.take(idx)
+        t.n = len(idx)
+        return t
+
+    ''' Returns a new table with the matching rows
+        @param [in] a   - Boolean mask with one entry per row,
+                          a callable taking a BagRow,
+                          or a compound key
+        @param [in] f   - If a is a compound key, predicate called
+                          with the column value of each row
+
+        Rows missing the key are never passed to the predicate, a
+        compound key without a predicate raises ValueError.
+
+        Example:
+        @begincode
+
+            t.filter(t.column('a.b') > 3)       # numpy mask
+            t.filter('a.b', lambda v: v > 3)
+            t.filter(lambda r: r.a.b > 3)
+
+        @endcode
+    '''
+    def filter(self, a, f=None, sep='.'):
+        if f is not None:
+            p = tuple(a.split(sep)) if isinstance(a, str) else (a,)
+            c = self.cols.get(p)
+            if c is None:
+                return self.take(())
+            if c.mask is None:
+                idx = [i for i, v in enumerate(c.data) if f(v)]
+            else:
+                m = c.mask
+                idx = [i for i, v in enumerate(c.data) if m[i] and f(v)]
+        elif callable(a):
+            idx = [i for i in range(self.n) if a(BagRow(self, i))]
+        elif isinstance(a, str):
+            raise ValueError('Filter on a key needs a predicate : %s' % a)
+        else:
+            if numpy is not None and isinstance(a, numpy.ndarray):
+                idx = numpy.flatnonzero(a).tolist()
+            else:
+                idx = [i for i, m in enumerate(a) if m]
+        return self.take(idx)
+
+    ''' Returns all rows as a list of dict
+    '''
+    def to_dicts(self):
+        rows = [{} for _ in range(self.n)]
+        for p, c in self.cols.items():
+            data = c.data.tolist() if isinstance(c.data, array) else c.data
+            mask = c.mask
+            if 1 == len(p):
+                k = p[0]
+                for i, v in enumerate(data):
+                    if mask is None or mask[i]:
+                        rows[i][k] = dict() if isinstance(v, dict) else v
+                continue
+            head, last = p[:-1], p[-1]
+            for i, v in enumerate(data):
+                if mask is None or mask[i]:
+                    d = rows[i]
+                    for k in head:
+                        d = d.setdefault(k, {})
+                    d[last] = dict() if isinstance(v, dict) else v
+        return rows
+
+    ''' Returns all rows as a list of Bag objects
+    '''
+    def to_bags(self):
+        return [Bag(d) for d in self.to_dicts()]
+
+    toBags = to_bags
+
+    ''' Creates a table from a list of Bag or dict objects
+        @param [in] bags    - Iterable of Bag or dict objects
+    '''
+    @classmethod
+    def from_bags(cls, bags):
+        return cls(bags)
+
+    fromBags = from_bags
+
+    ''' Converts the table to newline delimited json
+        @param [in] f   - Optional file object to write to
+
+        @returns The ndjson string if f is not provided
+    '''
+    def to_ndjson(self, f=None):
+        dumps = json.dumps
+        if f is None:
+            return ''.join(dumps(d) + '\n' for d in self.to_dicts())
+        for d in self.to_dicts():
+            f.write(dumps(d) + '\n')
+
+    toNdjson = to_ndjson
+
+    ''' Creates a table from newline delimited json
+        @param [in] src     - ndjson string or iterable of lines (such as a file)
+        @param [in] intern  - Key and value interning, see propertybag.intern
+    '''
+    @classmethod
+    def from_ndjson(cls, src, intern=None):
+        if isinstance(src, (str, bytes)):
+            src = src.splitlines()
+        it = resolveIntern(intern)
+        loads = json.loads if it is None else it.loads
+        t = cls()
+        for line in src:
+            if line.strip():
+                t.append(loads(line))
+        return t
+
+    fromNdjson = from_ndjson
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import json
+import time
+import random
+import timeit
+import platform
+import itertools
+
+''' Benchmark suite
+
+    Cases register themselves with the @case() decorator and are run over
+    every combination of the parameters they declare. Results are stored
+    as json so two runs can be compared with compare().
+
+    @begincode
+
+        python3 -m propertybag.bench run -o before.json
+        python3 -m propertybag.bench run -o after.json
+        python3 -m propertybag.bench compare before.json after.json
+
+    @endcode
+'''
+
+QUICK = {
+    'size': [10**2, 10**3, 10**4],
+    'depth': [1, 4, 16],
+    'hit': [1.0, 0.0],
+}
+
+FULL = {
+    'size': [10**2, 10**3, 10**4, 10**5, 10**6, 10**7],
+    'depth': [1, 2, 4, 8, 16, 32],
+    'hit': [1.0, 0.9, 0.5, 0.0],
+}
+
+# Skip parameter combinations with more tree nodes than this
+MAX_NODES = 3 * 10**7
+
+# Number of keys each lookup case walks per call
+BATCH = 1000
+
+_cases = {}
+
+
+''' Registers a benchmark case
+    @param [in] name    - Case name
+    @param [in] params  - Names of the parameters the case varies over,
+                          any of 'size', 'depth' and 'hit'
+    @param [in] fixed   - Values for parameters not in params
+
+    The decorated function is called with the parameters as keyword
+    arguments and returns a tuple (fn, ops) where fn is the callable to
+    time and ops is the number of operations fn performs. An optional
+    third tuple item is called once timing is done, and an optional
+    fourth is a dict of extra measurements stored with the result.
+'''
+def case(name, params=(), **fixed):
+    def reg(f):
+        _cases[name] = (f, tuple(params), fixed)
+        return f
+    return reg
+
+''' Returns the registered cases
+'''
+def cases():
+    _loadCases()
+    return dict(_cases)
+
+def _loadCases():
+    from . import bulk, cache, computed, core, fingerprint, instrument, intern, lazy, persist, startup, tree
+
+
+#--------------------------------------------------------------------------------------------------
+# Tree helpers
+
+''' Returns the branching factor used for a tree
+    @param [in] size    - Number of leaves
+    @param [in] depth   - Depth of every leaf
+'''
+def fanout(size, depth):
+    b = max(2, int(round(size ** (1.0 / depth))))
+    while b ** depth < size:
+        b += 1
+    return b
+
+''' Returns the key path of leaf i
+'''
+def leafPath(i, size, depth):
+    b = fanout(size, depth)
+    p = []
+    for _ in range(depth):
+        i, r = divmod(i, b)
+        p.append('k%d' % r)
+    return p[::-1]
+
+''' Builds a dict with size leaves, each at the specified depth
+    @param [in] size    - Number of leaves
+    @param [in] depth   - Depth of every leaf
+'''
+def makeTree(size, depth):
+    root = {}
+    b = fanout(size, depth)
+    keys = ['k%d' % i for i in range(b)]
+    for i in range(size):
+        d = root
+        n = i
+        digits = []
+        for _ in range(depth):
+            n, r = divmod(n, b)
+            digits.append(r)
+        for r in reversed(digits[1:]):
+            k = keys[r]
+            c = d.get(k)
+            if c is None:
+                c = d[k] = {}
+            d = c
+        d[keys[digits[0]]] = i
+    return root
+
+''' Returns the approximate node count of a tree
+'''
+def nodeCount(size, depth):
+    return size * min(depth, 2) + depth
+
+''' Returns BATCH compound keys, a hit fraction of which exist
+    @param [in] size    - Number of leaves
+    @param [in] depth   - Depth of every leaf
+    @param [in] hit     - Fraction of keys that exist
+    @param [in] seed    - Random seed
+'''
+def makeKeys(size, depth, hit, seed=1):
+    rnd = random.Random(seed)
+    r = []
+    for j in range(BATCH):
+        p = leafPath(rnd.randrange(size), size, depth)
+        if rnd.random() >= hit:
+            p[-1] = 'missing'
+        r.append(p)
+    return r
+
+
+#--------------------------------------------------------------------------------------------------
+# Running
+
+''' Returns the parameter combinations for a case
+    @param [in] params  - Parameter names
+    @param [in] grid    - dict of parameter name to list of values
+'''
+def combos(params, grid):
+    if not params:
+        yield {}
+        return
+    for vals in itertools.product(*[grid[p] for p in params]):
+        c = dict(zip(params, vals))
+        if nodeCount(c.get('size', 1), c.get('depth', 1)) > MAX_NODES:
+            continue
+        yield c
+
+''' Returns the result key for a case and its parameters
+'''
+def resultKey(name, p):
+    return '/'.join([name] + ['%s=%s' % (k, p[k]) for k in sorted(p)])
+
+''' Times a callable
+    @param [in] fn      - Callable to time
+    @param [in] ops     - Number of operations per call
+    @param [in] repeat  - Number of timing rounds
+    @param [in] mintime - Minimum duration of a timing round in seconds
+
+    @returns Best time per operation in seconds
+'''
+def measure(fn, ops=1, repeat=3, mintime=0.05):
+    t = timeit.Timer(fn)
+    n = 1
+    while True:
+        d = t.timeit(n)
+        if d >= mintime or n >= 1 << 24:
+            break
+        n *= 2 if d <= 0 else max(2, min(10, int(mintime / d) + 1))
+    best = d
+    for _ in range(repeat - 1):
+        best = min(best, t.timeit(n))
+    return best / (n * ops)
+
+''' Runs the benchmark cases
+    @param [in] grid    - dict of parameter name to list of values
+    @param [in] select  - Only run cases whose name contains one of these strings
+    @param [in] repeat  - Number of timing rounds
+    @param [in] mintime - Minimum duration of a timing round in seconds
+    @param [in] log     - Progress callback or None
+
+    @returns dict with 'meta' and 'results'
+'''
+def run(grid=None, select=None, repeat=3, mintime=0.05, log=None):
+    grid = dict(QUICK, **(grid or {}))
+    results = {}
+    for name, (f, params, fixed) in sorted(cases().items()):
+        if select and not any(s in name for s in select):
+            continue
+        for p in combos(params, grid):
+            kw = dict(fixed, **p)
+            c = f(**kw)
+            fn, ops = c[0], c[1]
+            try:
+                sec = measure(fn, ops, repeat, mintime)
+            finally:
+                if 2 < len(c) and c[2]:
+                    c[2]()
+            k = resultKey(name, p)
+            results[k] = {'case': name, 'params': p, 'sec': sec}
+            info = ''
+            if 3 < len(c):
+                results[k]['info'] = c[3]
+                info = ''.join('  %s=%s' % i for i in sorted(c[3].items()))
+            if log:
+                log('%-48s %12.3f us%s' % (k, 1e6 * sec, info))
+            del fn, c
+    return {'meta': meta(), 'results': results}
+
+''' Returns information about the environment
+'''
+def meta():
+    import propertybag
+    return {
+        'version': propertybag.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+''' Saves results to a json file
+'''
+def save(r, fname):
+    with open(fname, 'w') as f:
+        json.dump(r, f, indent=2, sort_keys=True)
+
+''' Loads results from a json file
+'''
+def load(fname):
+    with open(fname) as f:
+        return json.load(f)
+
+''' Compares two benchmark results
+    @param [in] old         - Baseline results
+    @param [in] new         - New results
+    @param [in] threshold   - Relative slowdown that counts as a regression
+
+    @returns List of (key, old sec, new sec, ratio, flag) sorted by key,
+             where flag is 'regression', 'improvement' or ''
+'''
+def compare(old, new, threshold=0.1):
+    a = old['results']
+    b = new['results']
+    r = []
+    for k in sorted(set(a) & set(b)):
+        o = a[k]['sec']
+        n = b[k]['sec']
+        ratio = n / o if o else float('inf')
+        flag = ''
+        if ratio > 1.0 + threshold:
+            flag = 'regression'
+        elif ratio < 1.0 / (1.0 + threshold):
+            flag = 'improvement'
+        r.append((k, o, n, ratio, flag))
+    return r
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import sys
+import argparse
+
+from . import QUICK, FULL, run, save, load, compare
+
+Log = print
+
+
+def cmdRun(opts):
+    grid = dict(FULL if opts.full else QUICK)
+    for k in ('size', 'depth', 'hit'):
+        v = getattr(opts, k)
+        if v:
+            grid[k] = [type(grid[k][0])(float(x)) for x in v.split(',')]
+    r = run(grid, opts.select, opts.repeat, opts.mintime, Log)
+    if opts.output:
+        save(r, opts.output)
+        Log('Saved %d results to %s' % (len(r['results']), opts.output))
+    return 0
+
+def cmdCompare(opts):
+    rows = compare(load(opts.old), load(opts.new), opts.threshold)
+    bad = 0
+    Log('%-48s %12s %12s %8s' % ('case', 'old us', 'new us', 'ratio'))
+    for k, o, n, ratio, flag in rows:
+        if opts.changed and not flag:
+            continue
+        Log('%-48s %12.3f %12.3f %8.2f %s' % (k, 1e6 * o, 1e6 * n, ratio, flag))
+        if 'regression' == flag:
+            bad += 1
+    Log('%d regressions beyond %.0f%%' % (bad, 100 * opts.threshold))
+    return 1 if bad else 0
+
+def main():
+    ap = argparse.ArgumentParser(prog='python -m propertybag.bench', description='propertybag benchmarks')
+    sub = ap.add_subparsers(dest='cmd')
+
+    r = sub.add_parser('run', help='Run benchmarks')
+    r.add_argument('-o', '--output', help='Save results to this json file')
+    r.add_argument('-k', '--select', action='append', help='Only run cases containing this string')
+    r.add_argument('--full', action='store_true', help='Full parameter grid (sizes up to 10^7)')
+    r.add_argument('--size', help='Comma separated leaf counts')
+    r.add_argument('--depth', help='Comma separated depths')
+    r.add_argument('--hit', help='Comma separated hit ratios')
+    r.add_argument('--repeat', type=int, default=3, help='Timing rounds')
+    r.add_argument('--mintime', type=float, default=0.05, help='Minimum seconds per timing round')
+
+    c = sub.add_parser('compare', help='Compare two result files')
+    c.add_argument('old')
+    c.add_argument('new')
+    c.add_argument('-t', '--threshold', type=float, default=0.1, help='Relative slowdown flagged as regression')
+    c.add_argument('--changed', action='store_true', help='Only list regressions and improvements')
+
+    opts = ap.parse_args()
+    if 'run' == opts.cmd:
+        return cmdRun(opts)
+    if 'compare' == opts.cmd:
+        return cmdCompare(opts)
+    ap.print_help()
+    return 2
+
+if __name__ == '__main__':
+    sys.exit(main())
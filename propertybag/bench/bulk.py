@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+import propertybag as pb
+
+from . import case
+from . intern import _corpus
+
+''' Benchmarks for load_many()
+
+    Loads an ndjson file of size user records. 'serial' is one Bag(str)
+    per line, 'process' and 'thread' use load_many() with one worker per
+    cpu and 'paths' only brings back two values per record. Times include
+    starting the worker pool.
+'''
+
+
+def _file(size):
+    tmp = tempfile.mkdtemp()
+    fname = os.path.join(tmp, 'docs.ndjson')
+    with open(fname, 'w') as f:
+        for s in _corpus(size):
+            f.write(s + '\n')
+    return tmp, fname
+
+@case('load.serial', ('size',))
+def bSerial(size):
+    tmp, fname = _file(size)
+    def fn():
+        with open(fname) as f:
+            for line in f:
+                pb.Bag(line)
+    return fn, size, lambda: shutil.rmtree(tmp)
+
+def _many(size, mode, paths):
+    tmp, fname = _file(size)
+    def fn():
+        for b in pb.load_many(fname, mode=mode, kind='ndjson', chunksize=256, paths=paths):
+            pass
+    return fn, size, lambda: shutil.rmtree(tmp)
+
+case('load_many.process', ('size',), mode='process', paths=None)(_many)
+case('load_many.thread', ('size',), mode='thread', paths=None)(_many)
+case('load_many.paths', ('size',), mode='process', paths=['id', 'profile.plan'])(_many)
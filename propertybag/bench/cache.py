@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import random
+import itertools
+
+import propertybag as pb
+
+from . import case, BATCH
+
+''' Benchmarks for CacheBag
+
+    Reads BATCH keys drawn from a Zipf distribution over size keys, and
+    sets the missing ones, with room for a tenth of the keys. The hit
+    ratio is reported with the result. 'plain' is the same loop on a Bag
+    without limits.
+'''
+
+ZIPF = 1.1
+
+
+def _keys(size, seed=1):
+    cum = list(itertools.accumulate(1.0 / (i + 1) ** ZIPF for i in range(size)))
+    rnd = random.Random(seed)
+    return ['u.k%d.v' % i for i in rnd.choices(range(size), cum_weights=cum, k=BATCH)]
+
+def _zipf(size, policy):
+    keys = _keys(size)
+    if policy:
+        bag = pb.CacheBag(ttl=3600, max_entries=max(1, size // 10), policy=policy)
+    else:
+        bag = pb.Bag()
+    get = bag.get
+    put = bag.set
+    def fn():
+        for k in keys:
+            if get(k) is None:
+                put(k, 1)
+    fn()
+    info = {}
+    if policy:
+        s = bag.stats()
+        info['hit_ratio'] = round(s['hits'] / float(s['hits'] + s['misses']), 3)
+    return fn, BATCH, None, info
+
+case('cache.lru', ('size',), policy='lru')(_zipf)
+case('cache.lfu', ('size',), policy='lfu')(_zipf)
+case('cache.plain', ('size',), policy=None)(_zipf)
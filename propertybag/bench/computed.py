@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import propertybag as pb
+
+from . import case, BATCH
+
+''' Benchmarks for computed properties
+
+    The bag holds size source values and size computed properties, each
+    the double of one source. 'read' reads BATCH computed values that are
+    already stored and 'plain' the same keys in a bag with plain values,
+    'attr' reads one through attribute access. 'change' sets a source and
+    reads its computed value again, which is computed once more.
+'''
+
+
+def _bag(size, computed):
+    bag = pb.Bag({'src': {'k%d' % i: i for i in range(size)}, 'out': {}})
+    for i in range(size):
+        k = 'k%d' % i
+        if computed:
+            bag.compute('out.' + k, lambda b, k=k: 2 * b.src.get(k))
+        else:
+            bag.set('out.' + k, 2 * i)
+    keys = ['out.k%d' % (i % size) for i in range(BATCH)]
+    for k in keys:
+        bag.get(k)
+    return bag, keys
+
+def _read(size, computed):
+    bag, keys = _bag(size, computed)
+    get = bag.get
+    def fn():
+        for k in keys:
+            get(k)
+    return fn, BATCH
+
+case('computed.read', ('size',), computed=True)(_read)
+case('computed.plain', ('size',), computed=False)(_read)
+
+@case('computed.attr', ('size',))
+def bAttr(size):
+    bag, keys = _bag(size, True)
+    def fn():
+        for _ in range(BATCH):
+            bag.out.k0
+    return fn, BATCH
+
+@case('computed.change', ('size',))
+def bChange(size):
+    bag, keys = _bag(size, True)
+    src = bag.src
+    def fn():
+        for i in range(BATCH):
+            src.k0 = i
+            bag.out.k0
+    return fn, BATCH
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import copy
+import json
+
+import propertybag as pb
+
+from . import case, makeTree, makeKeys, leafPath, BATCH
+
+''' Benchmarks for the core Bag operations
+'''
+
+
+@case('get', ('size', 'depth', 'hit'))
+def bGet(size, depth, hit):
+    bag = pb.Bag(makeTree(size, depth))
+    keys = ['.'.join(p) for p in makeKeys(size, depth, hit)]
+    get = bag.get
+    def fn():
+        for k in keys:
+            get(k)
+    return fn, BATCH
+
+@case('exists', ('size', 'depth', 'hit'))
+def bExists(size, depth, hit):
+    bag = pb.Bag(makeTree(size, depth))
+    keys = ['.'.join(p) for p in makeKeys(size, depth, hit)]
+    exists = bag.exists
+    def fn():
+        for k in keys:
+            exists(k)
+    return fn, BATCH
+
+@case('bag', ('size', 'depth', 'hit'))
+def bBag(size, depth, hit):
+    bag = pb.Bag(makeTree(size, depth))
+    keys = ['.'.join(p[:-1]) or p[0] for p in makeKeys(size, depth, hit)]
+    b = bag.bag
+    def fn():
+        for k in keys:
+            b(k)
+    return fn, BATCH
+
+@case('attr', ('size', 'depth', 'hit'))
+def bAttr(size, depth, hit):
+    bag = pb.Bag(makeTree(size, depth), '', '')
+    keys = makeKeys(size, depth, hit)
+    def fn():
+        for p in keys:
+            r = bag
+            for k in p:
+                r = getattr(r, k)
+    return fn, BATCH
+
+@case('item', ('size', 'depth', 'hit'))
+def bItem(size, depth, hit):
+    bag = pb.Bag(makeTree(size, depth), '', '')
+    keys = makeKeys(size, depth, hit)
+    def fn():
+        for p in keys:
+            r = bag
+            for k in p:
+                r = r[k]
+    return fn, BATCH
+
+@case('set', ('size', 'depth'))
+def bSet(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    keys = ['.'.join(p) for p in makeKeys(size, depth, 1.0)]
+    s = bag.set
+    def fn():
+        for k in keys:
+            s(k, 1)
+    return fn, BATCH
+
+@case('setattr', ('size',))
+def bSetAttr(size):
+    bag = pb.Bag(makeTree(size, 1))
+    keys = [p[0] for p in makeKeys(size, 1, 1.0)]
+    def fn():
+        for k in keys:
+            setattr(bag, k, 1)
+    return fn, BATCH
+
+@case('delete', ('size', 'depth'))
+def bDelete(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    keys = ['.'.join(p) for p in makeKeys(size, depth, 1.0)]
+    s = bag.set
+    d = bag.delete
+    def fn():
+        for k in keys:
+            d(k)
+            s(k, 1)
+    return fn, BATCH
+
+@case('merge', ('size',))
+def bMerge(size):
+    bag = pb.Bag(makeTree(size, 1))
+    other = {'k%d' % i: i for i in range(0, size, 10)}
+    def fn():
+        bag.merge(other)
+    return fn, 1
+
+@case('update', ('size',))
+def bUpdate(size):
+    bag = pb.Bag(makeTree(size, 1))
+    other = {'k%d' % i: i for i in range(0, size, 10)}
+    def fn():
+        bag.update(other)
+    return fn, 1
+
+@case('copy', ('size', 'depth'))
+def bCopy(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    def fn():
+        bag.copy()
+    return fn, 1
+
+@case('to_json', ('size', 'depth'))
+def bToJson(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    def fn():
+        bag.to_json()
+    return fn, 1
+
+@case('from_str', ('size', 'depth'))
+def bFromStr(size, depth):
+    s = json.dumps(makeTree(size, depth))
+    def fn():
+        pb.Bag(s)
+    return fn, 1
+
+@case('eq', ('size', 'depth'))
+def bEq(size, depth):
+    a = pb.Bag(makeTree(size, depth))
+    b = pb.Bag(makeTree(size, depth))
+    def fn():
+        a == b
+    return fn, 1
+
+@case('iter', ('size',))
+def bIter(size):
+    bag = pb.Bag(makeTree(size, 1))
+    def fn():
+        for k, v in bag.items():
+            pass
+    return fn, size
+
+@case('len', ('size',))
+def bLen(size):
+    bag = pb.Bag(makeTree(size, 1))
+    def fn():
+        for _ in range(BATCH):
+            len(bag)
+    return fn, BATCH
+
+@case('as_dict', ('size',))
+def bAsDict(size):
+    bag = pb.Bag(makeTree(size, 1))
+    def fn():
+        for _ in range(BATCH):
+            bag.as_dict()
+    return fn, BATCH
+
+@case('transaction', ('size', 'depth'))
+def bTransaction(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    keys = ['.'.join(p) for p in makeKeys(size, depth, 1.0)[:10]]
+    def fn():
+        tx = bag.transaction()
+        for k in keys:
+            bag.set(k, 0)
+        tx.rollback()
+    return fn, 1
+
+@case('deepcopy', ('size', 'depth'))
+def bDeepCopy(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    def fn():
+        copy.deepcopy(bag.as_dict())
+    return fn, 1
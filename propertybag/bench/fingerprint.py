@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import propertybag as pb
+
+from . import case, makeTree, makeKeys
+
+''' Benchmarks for fingerprints
+
+    Compare with the 'eq' case, which compares two bags with ==.
+    'eq' compares the fingerprints of two equal bags with
+    same_fingerprint(), 'change' changes one leaf and compares, 'diff' changes 10 leaves and lists them and 'build'
+    fingerprints a bag from scratch.
+
+    Run with --size 1000000 for the 10^6 leaf numbers.
+'''
+
+
+def _pair(size, depth):
+    a = pb.Bag(makeTree(size, depth))
+    b = pb.Bag(makeTree(size, depth))
+    a.fingerprint()
+    b.fingerprint()
+    return a, b
+
+@case('fingerprint.eq', ('size', 'depth'))
+def bEq(size, depth):
+    a, b = _pair(size, depth)
+    def fn():
+        a.same_fingerprint(b)
+    return fn, 1
+
+@case('fingerprint.change', ('size', 'depth'))
+def bChange(size, depth):
+    a, b = _pair(size, depth)
+    k = '.'.join(makeKeys(size, depth, 1.0)[0])
+    v = [a.get(k), -1]
+    def fn():
+        v.reverse()
+        a.set(k, v[0])
+        a.same_fingerprint(b)
+    return fn, 1
+
+@case('fingerprint.diff', ('size', 'depth'))
+def bDiff(size, depth):
+    a, b = _pair(size, depth)
+    keys = ['.'.join(p) for p in makeKeys(size, depth, 1.0)[:10]]
+    for k in keys:
+        a.set(k, -1)
+    def fn():
+        a.diff(b)
+    return fn, 1
+
+@case('fingerprint.build', ('size', 'depth'))
+def bBuild(size, depth):
+    a = pb.Bag(makeTree(size, depth))
+    def fn():
+        a.clear_fingerprints()
+        a.fingerprint()
+    return fn, 1
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import propertybag as pb
+from propertybag import instrument
+
+from . import case, makeTree, makeKeys, BATCH
+
+''' Benchmarks for the access instrumentation
+
+    The 'off' cases run after instrumentation has been enabled and disabled
+    again and should match the plain 'get', 'attr' and 'set' cases.
+'''
+
+
+def _setup(size, depth, on):
+    instrument.enable(sample_rate=0.01)
+    if not on:
+        instrument.disable()
+    instrument.reset()
+    bag = pb.Bag(makeTree(size, depth), '', '')
+    return bag, makeKeys(size, depth, 1.0)
+
+def _done():
+    instrument.disable()
+    instrument.reset()
+
+def _get(size, depth, on):
+    bag, keys = _setup(size, depth, on)
+    keys = ['.'.join(p) for p in keys]
+    def fn():
+        for k in keys:
+            bag.get(k)
+    return fn, BATCH, _done
+
+def _attr(size, depth, on):
+    bag, keys = _setup(size, depth, on)
+    def fn():
+        for p in keys:
+            r = bag
+            for k in p:
+                r = getattr(r, k)
+    return fn, BATCH, _done
+
+def _set(size, depth, on):
+    bag, keys = _setup(size, depth, on)
+    keys = ['.'.join(p) for p in keys]
+    def fn():
+        for k in keys:
+            bag.set(k, 1)
+    return fn, BATCH, _done
+
+for _n, _f in (('get', _get), ('attr', _attr), ('set', _set)):
+    case('instrument_off.' + _n, ('depth',), size=1000, on=False)(_f)
+    case('instrument_on.' + _n, ('depth',), size=1000, on=True)(_f)
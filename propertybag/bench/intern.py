@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import json
+import random
+import tracemalloc
+
+import propertybag as pb
+
+from . import case, BATCH
+
+''' Benchmarks for key and value interning
+
+    The corpus is size user records with the same keys, a few enumerated
+    values (status, country, plan, ...) and unique ids and names. 'load'
+    times Bag(str) per record and reports the memory held by the loaded
+    bags, 'ndjson' times BagTable.from_ndjson() and 'attr' reads
+    attributes from the loaded bags.
+'''
+
+
+def _corpus(size):
+    rnd = random.Random(1)
+    return [json.dumps({
+        'id': i,
+        'name': 'user %d' % i,
+        'email': 'user%d@example.com' % i,
+        'status': rnd.choice(['active', 'inactive', 'pending']),
+        'country': rnd.choice(['US', 'DE', 'FR', 'JP', 'BR', 'IN']),
+        'tags': [rnd.choice(['admin', 'beta', 'staff', 'trial']) for _ in range(2)],
+        'profile': {'age': rnd.randrange(18, 90), 'plan': rnd.choice(['free', 'pro', 'team']),
+                    'city': 'city %d' % rnd.randrange(100), 'lang': rnd.choice(['en', 'de', 'fr'])},
+    }) for i in range(size)]
+
+def _table(it):
+    return pb.InternTable() if it else False
+
+''' Returns the bytes held by the bags loaded from a corpus
+'''
+def _memory(docs, it):
+    t = _table(it)
+    tracemalloc.start()
+    try:
+        bags = [pb.Bag(s, _intern=t) for s in docs]
+        n = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del bags
+    return n
+
+def _load(size, it):
+    docs = _corpus(size)
+    t = _table(it)
+    Bag = pb.Bag
+    def fn():
+        for s in docs:
+            Bag(s, _intern=t)
+    mem = _memory(docs, it)
+    return fn, size, None, {'bytes': mem, 'bytes_per_doc': mem // size}
+
+def _ndjson(size, it):
+    src = '\n'.join(_corpus(size))
+    t = _table(it)
+    def fn():
+        pb.BagTable.from_ndjson(src, intern=t)
+    return fn, size
+
+def _attr(size, it):
+    t = _table(it)
+    bags = [pb.Bag(s, _intern=t) for s in _corpus(size)]
+    bags = [bags[i % size] for i in range(BATCH)]
+    def fn():
+        for b in bags:
+            b.status
+            b.country
+            b.profile
+    return fn, 3 * BATCH
+
+for _n, _f in (('load', _load), ('ndjson', _ndjson), ('attr', _attr)):
+    case('intern.' + _n, ('size',), it=True)(_f)
+    case('plain.' + _n, ('size',), it=False)(_f)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import json
+import random
+
+import propertybag as pb
+
+from . import case
+
+''' Benchmarks for LazyBag against Bag(str)
+
+    Documents hold size / 8 records of 8 leaves each. 'first' reads a
+    single value from the middle of a freshly loaded document, 'sparse'
+    reads 1% of the records and 'dump' serializes a document after a
+    sparse read.
+'''
+
+
+def _doc(size):
+    n = max(1, size // 8)
+    return json.dumps({'rec%d' % i: {'id': i, 'name': 'user %d' % i, 'tags': ['a', 'b'],
+                                     'profile': {'age': i % 90, 'city': 'city %d' % (i % 50), 'score': i * 0.5}}
+                       for i in range(n)}), n
+
+def _first(size, cls):
+    s, n = _doc(size)
+    k = 'rec%d.profile.age' % (n // 2)
+    def fn():
+        cls(s).get(k)
+    return fn, 1
+
+def _sparse(size, cls):
+    s, n = _doc(size)
+    keys = ['rec%d.name' % i for i in random.Random(1).sample(range(n), max(1, n // 100))]
+    def fn():
+        b = cls(s)
+        for k in keys:
+            b.get(k)
+    return fn, 1
+
+def _dump(size, cls):
+    s, n = _doc(size)
+    b = cls(s)
+    for i in random.Random(1).sample(range(n), max(1, n // 100)):
+        b.get('rec%d.name' % i)
+    def fn():
+        b.to_json()
+    return fn, 1
+
+for _n, _f in (('first', _first), ('sparse', _sparse), ('dump', _dump)):
+    case('lazy.' + _n, ('size',), cls=pb.LazyBag)(_f)
+    case('eager.' + _n, ('size',), cls=pb.Bag)(_f)
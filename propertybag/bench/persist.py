@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+
+import propertybag as pb
+
+from . import case, makeTree, makeKeys, BATCH
+
+''' Benchmarks for PersistentBag
+
+    Each call makes BATCH changes to a bag with size leaves. 'journal'
+    writes every change, 'batch' buffers 64 changes per write and
+    'rewrite' is the alternative of saving the whole bag with to_json()
+    after every 100 changes.
+'''
+
+REWRITE_EVERY = 100
+
+
+def _setup(size, depth):
+    tmp = tempfile.mkdtemp()
+    fname = os.path.join(tmp, 'state.json')
+    with open(fname, 'w') as f:
+        f.write(pb.Bag(makeTree(size, depth)).to_json())
+    keys = ['.'.join(p) for p in makeKeys(size, depth, 1.0)]
+    return tmp, fname, keys
+
+def _journal(size, depth, batch, sync):
+    tmp, fname, keys = _setup(size, depth)
+    bag = pb.PersistentBag(fname, batch=batch, sync=sync)
+    def fn():
+        for k in keys:
+            bag.set(k, 1)
+    def done():
+        bag.close()
+        shutil.rmtree(tmp)
+    return fn, BATCH, done
+
+def _rewrite(size, depth):
+    tmp, fname, keys = _setup(size, depth)
+    bag = pb.Bag(makeTree(size, depth))
+    def save():
+        with open(fname + '.tmp', 'w') as f:
+            f.write(bag.to_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(fname + '.tmp', fname)
+    def fn():
+        for i, k in enumerate(keys):
+            bag.set(k, 1)
+            if 0 == i % REWRITE_EVERY:
+                save()
+    return fn, BATCH, lambda: shutil.rmtree(tmp)
+
+case('persist.journal', ('size', 'depth'), batch=1, sync='interval')(_journal)
+case('persist.batch', ('size', 'depth'), batch=64, sync='interval')(_journal)
+case('persist.rewrite', ('size', 'depth'))(_rewrite)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+import propertybag as pb
+
+from . import case
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+''' Benchmarks for startup
+
+    'import' runs a new interpreter that imports propertybag, 'python' one
+    that does nothing, the difference is the import time. 'load.<fmt>'
+    loads a config file with size values in sections of ten, and
+    'load.<fmt>.cached' loads it from the parsed result cache.
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _run(code):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    cmd = [sys.executable, '-c', code]
+    def fn():
+        subprocess.run(cmd, env=env, check=True)
+    return fn, 1
+
+case('startup.python', code='pass')(_run)
+case('startup.import', code='import propertybag')(_run)
+
+def _sections(size):
+    return {'s%d' % i: {'k%d' % j: 'value %d' % (10 * i + j) for j in range(10)}
+            for i in range(max(1, size // 10))}
+
+def _write(fname, fmt, d):
+    with open(fname, 'w') as f:
+        if 'json' == fmt:
+            json.dump(d, f)
+        elif 'yaml' == fmt:
+            yaml.safe_dump(d, f)
+        else:
+            for s, kv in d.items():
+                if 'env' == fmt:
+                    f.writelines('APP__%s__%s=%s\n' % (s.upper(), k.upper(), v) for k, v in kv.items())
+                else:
+                    f.write('[%s]\n' % s)
+                    q = '"%s"' if 'toml' == fmt else '%s'
+                    f.writelines(('%s = ' + q + '\n') % (k, v) for k, v in kv.items())
+
+def _load(size, fmt, cached):
+    tmp = tempfile.mkdtemp()
+    fname = os.path.join(tmp, 'config.' + fmt)
+    _write(fname, fmt, _sections(size))
+    cache = os.path.join(tmp, 'cache') if cached else False
+    prefix = 'APP' if 'env' == fmt else None
+    load = pb.Bag.load_file
+    load(fname, cache=cache, prefix=prefix)
+    def fn():
+        load(fname, cache=cache, prefix=prefix)
+    return fn, 1, lambda: shutil.rmtree(tmp)
+
+for _fmt in ('json', 'toml', 'ini', 'env') + (('yaml',) if yaml else ()):
+    case('load.' + _fmt, ('size',), fmt=_fmt, cached=False)(_load)
+    case('load.%s.cached' % _fmt, ('size',), fmt=_fmt, cached=True)(_load)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import copy
+
+import propertybag as pb
+
+from . import case, makeTree
+
+''' Benchmarks for the non recursive tree functions
+
+    Times are per leaf of a tree with size leaves at the given depth, the
+    width is the branching factor that gives size leaves. 'deepcopy' is
+    compared with 'copy_deepcopy', copy.deepcopy() of the same dict, and
+    'equal' with 'eq', dict == of two equal copies. 'chain' deep copies a
+    single chain of size nested dicts, which copy.deepcopy() can not do
+    past the recursion limit.
+'''
+
+
+@case('tree.deepcopy', ('size', 'depth'))
+def bDeepcopy(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    def fn():
+        bag.deepcopy()
+    return fn, size
+
+@case('tree.copy_deepcopy', ('size', 'depth'))
+def bCopyDeepcopy(size, depth):
+    d = makeTree(size, depth)
+    def fn():
+        copy.deepcopy(d)
+    return fn, size
+
+def _pair(size, depth):
+    a = pb.Bag(makeTree(size, depth))
+    return a, a.deepcopy()
+
+@case('tree.equal', ('size', 'depth'))
+def bEqual(size, depth):
+    a, b = _pair(size, depth)
+    def fn():
+        a.deep_equal(b)
+    return fn, size
+
+@case('tree.eq', ('size', 'depth'))
+def bEq(size, depth):
+    a, b = _pair(size, depth)
+    a, b = a.as_dict(), b.as_dict()
+    def fn():
+        a == b
+    return fn, size
+
+@case('tree.walk', ('size', 'depth'))
+def bWalk(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    def fn():
+        for _ in bag.walk():
+            pass
+    return fn, size
+
+@case('tree.stats', ('size', 'depth'))
+def bStats(size, depth):
+    bag = pb.Bag(makeTree(size, depth))
+    def fn():
+        bag.depth_stats()
+    return fn, size
+
+@case('tree.chain', ('size',))
+def bChain(size):
+    d = root = {}
+    for _ in range(size):
+        d = d.setdefault('a', {})
+    d['v'] = 1
+    bag = pb.Bag(root)
+    def fn():
+        bag.deepcopy()
+    return fn, size
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import os
+import json
+import marshal
+import collections
+import concurrent.futures
+
+from . propertybag import Bag
+from . intern import resolve as resolveIntern
+
+''' Parallel bulk loading
+
+    load_many() parses many json documents in a pool of worker processes
+    (or threads) and yields them as Bags. Documents are sent to the workers
+    in chunks, and at most max_inflight chunks are queued or waiting to be
+    consumed, so memory stays bounded however many documents there are.
+
+    @begincode
+
+        # One document per file, in any order
+        for bag in pb.load_many(glob.glob('data/*.json'), ordered=False):
+            ...
+
+        # Only send a few values per document back from the workers
+        for bag in pb.load_many(['events.ndjson'], kind='ndjson', paths=['id', 'user.name']):
+            print(bag.id, bag.user.name)
+
+    @endcode
+'''
+
+# Buffer size for reading ndjson files
+BUFSIZE = 1 << 20
+
+KINDS = ('file', 'ndjson', 'json')
+MODES = ('process', 'thread')
+
+
+''' Returns a dict with only the values at the specified key paths
+    @param [in] d       - Parsed document
+    @param [in] paths   - List of key paths, already split
+'''
+def extract(d, paths):
+    r = {}
+    for ks in paths:
+        v = d
+        for k in ks:
+            if not isinstance(v, dict) or k not in v:
+                break
+            v = v[k]
+        else:
+            t = r
+            for k in ks[:-1]:
+                n = t.get(k)
+                if not isinstance(n, dict):
+                    n = t[k] = {}
+                t = n
+            t[ks[-1]] = v
+    return r
+
+''' Parses a chunk of documents, runs in the workers
+    @param [in] kind    - Source kind, see load_many()
+    @param [in] label   - Source name for error messages
+    @param [in] start   - Index or line number of the first item
+    @param [in] items   - File names, lines or json strings
+    @param [in] paths   - Split key paths to extract or None
+    @param [in] it      - Interning, see propertybag.intern
+
+    @returns List of dicts, None for blank ndjson lines
+'''
+def parseChunk(kind, label, start, items, paths, it):
+    t = resolveIntern(it)
+    loads = json.loads if t is None else t.loads
+    r = []
+    for j, s in enumerate(items):
+        if 'file' == kind:
+            label = s
+            with open(s, 'rb') as f:
+                s = f.read()
+        elif 'ndjson' == kind and not s.strip():
+            r.append(None)
+            continue
+        try:
+            d = loads(s)
+        except ValueError as e:
+            raise ValueError('Invalid json in %s : %s' % (where(kind, label, start + j), e))
+        if not isinstance(d, dict):
+            raise ValueError('Not a json object in %s' % where(kind, label, start + j))
+        r.append(d if paths is None else extract(d, paths))
+    return r
+
+''' Same as parseChunk(), returns the result marshalled
+
+    json only holds the basic types marshal supports, and marshal is
+    cheaper than the pickling a process pool uses otherwise.
+'''
+def parseChunkPacked(kind, label, start, items, paths, it):
+    return marshal.dumps(parseChunk(kind, label, start, items, paths, it))
+
+''' Returns the location of a document for error messages
+'''
+def where(kind, label, i):
+    if 'file' == kind:
+        return label
+    if 'ndjson' == kind:
+        return '%s:%d' % (label, i + 1)
+    return 'document %d' % i
+
+''' Splits the sources into chunks of work
+
+    @returns Iterator of (label, start, items) tuples
+'''
+def chunks(sources, kind, chunksize):
+    if 'ndjson' == kind:
+        for src in sources:
+            label = os.fspath(src)
+            with open(src, 'rb', buffering=BUFSIZE) as f:
+                start = 0
+                items = []
+                for line in f:
+                    items.append(line)
+                    if len(items) >= chunksize:
+                        yield label, start, items
+                        start += len(items)
+                        items = []
+                if items:
+                    yield label, start, items
+        return
+    start = 0
+    items = []
+    for src in sources:
+        items.append(os.fspath(src) if 'file' == kind else src)
+        if len(items) >= chunksize:
+            yield None, start, items
+            start += len(items)
+            items = []
+    if items:
+        yield None, start, items
+
+''' Loads many json documents in parallel
+    @param [in] sources         - Iterable of file names, or of json strings for kind 'json'
+    @param [in] workers         - Number of workers, None for one per cpu,
+                                  0 to parse in the calling thread
+    @param [in] mode            - 'process' or 'thread', threads only help
+                                  when reading the files is the slow part
+    @param [in] ordered         - True to yield in input order, False to yield
+                                  chunks as soon as they are done
+    @param [in] chunksize       - Documents sent to a worker at a time
+    @param [in] max_inflight    - Maximum chunks being parsed or waiting to be
+                                  consumed, None for twice the workers
+    @param [in] paths           - List of compound keys, if given each Bag only
+                                  holds the values at these keys
+    @param [in] kind            - 'file' for one document per file, 'ndjson'
+                                  for one document per line or 'json' if the
+                                  sources are json strings
+    @param [in] intern          - Interning, see propertybag.intern, worker
+                                  processes each use their own shared table
+    @param [in] sep             - Key separator for paths
+
+    @returns Iterator of Bag objects, blank ndjson lines are skipped
+
+    Example:
+    @begincode
+
+        bags = list(pb.load_many(files, workers=8, chunksize=256))
+
+    @endcode
+'''
+def load_many(sources, workers=None, mode='process', ordered=True, chunksize=64,
+              max_inflight=None, paths=None, kind='file', intern=None, sep='.'):
+    if mode not in MODES:
+        raise ValueError('Invalid mode : %s' % mode)
+    if kind not in KINDS:
+        raise ValueError('Invalid kind : %s' % kind)
+    if isinstance(sources, (str, bytes)) or hasattr(sources, '__fspath__'):
+        sources = [sources]
+    if paths is not None:
+        paths = [tuple(p.split(sep)) for p in paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunksize = max(1, int(chunksize))
+    it = resolveIntern(intern)
+    if it is None:
+        it = False
+    elif 'process' == mode and workers:
+        it = True
+
+    work = chunks(sources, kind, chunksize)
+    if not workers:
+        return _serial(work, kind, paths, it)
+    return _parallel(work, kind, paths, it, workers, mode, ordered,
+                     max_inflight or 2 * workers)
+
+''' Alias for load_many()
+'''
+loadMany = load_many
+
+def _bags(r):
+    for d in r:
+        if d is not None:
+            yield Bag(d)
+
+def _serial(work, kind, paths, it):
+    for label, start, items in work:
+        yield from _bags(parseChunk(kind, label, start, items, paths, it))
+
+def _parallel(work, kind, paths, it, workers, mode, ordered, max_inflight):
+    if 'process' == mode:
+        pool = concurrent.futures.ProcessPoolExecutor(workers)
+        parse = parseChunkPacked
+        bags = lambda r: _bags(marshal.loads(r))
+    else:
+        pool = concurrent.futures.ThreadPoolExecutor(workers)
+        parse = parseChunk
+        bags = _bags
+    pending = collections.deque() if ordered else set()
+    add = pending.append if ordered else pending.add
+    try:
+        for c in work:
+            add(pool.submit(parse, kind, c[0], c[1], c[2], paths, it))
+            if len(pending) < max_inflight:
+                continue
+            # Backpressure, wait for the consumer before reading more
+            if ordered:
+                yield from bags(pending.popleft().result())
+            else:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                add = pending.add
+                for f in done:
+                    yield from bags(f.result())
+        if ordered:
+            while pending:
+                yield from bags(pending.popleft().result())
+        else:
+            for f in concurrent.futures.as_completed(pending):
+                yield from bags(f.result())
+            pending = ()
+    finally:
+        for f in pending:
+            f.cancel()
+        pool.shutdown(wait=True)
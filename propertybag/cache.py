@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import time
+import heapq
+import weakref
+import threading
+import collections
+
+from . propertybag import Bag, PlaceHolder
+
+''' Cache mode for Bag
+
+    A CacheBag tracks the values written to it as cache entries. Each
+    set(), attribute or item write creates an entry at its key path,
+    unless the path is inside an existing entry, in which case it changes
+    that entry. Entries can expire after a time to live and the number of
+    entries can be capped, evicting the least recently (LRU) or least
+    frequently (LFU) used entry.
+
+    Expiry times are kept in a heap, so expiring or evicting an entry costs
+    O(log n) and no operation scans all entries. Due entries are removed
+    when the bag is next accessed, or by an optional background thread.
+
+    @begincode
+
+        cache = pb.CacheBag(ttl=300, max_entries=10000)
+        cache.set_ttl('user.*.session', 60)
+
+        cache.user[uid].profile = load_profile(uid)
+        cache.set('user.%d.session' % uid, s, ttl=30)
+
+        p = cache.user[uid].profile
+        if not p:
+            ...                         # Missing or expired
+        print(cache.stats())
+
+    @endcode
+'''
+
+POLICIES = ('lru', 'lfu')
+
+_MISS = object()
+
+
+#==================================================================================================
+''' class Cache
+
+    Entry bookkeeping of a CacheBag, installed as its write hook.
+
+    Entries are [path, expires, uses, seq] lists, found through a trie of
+    [entry, {key: node}] nodes that follows the key paths.
+'''
+class Cache():
+
+    ''' Constructor, see CacheBag for the parameters
+    '''
+    def __init__(self, bag, ttl, max_entries, policy, clock):
+        if policy not in POLICIES:
+            raise ValueError('Invalid eviction policy : %s' % policy)
+        self.bag = bag
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lfu = 'lfu' == policy
+        self.clock = clock
+        self.lock = threading.RLock()
+        self.tree = [None, {}]
+        # Trie of [ttl, {key: node}], _MISS where no rule is set
+        self.rules = [_MISS, {}]
+        self.order = collections.OrderedDict()
+        self.expiry = []
+        self.uses = []
+        self.seq = 0
+        self.pending = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.sweeper = None
+
+    ''' Removes entries that are due, called before every access
+    '''
+    def tick(self):
+        e = self.expiry
+        if e and e[0][0] <= self.clock():
+            self.expire()
+
+    ''' Removes all entries that are due
+        @returns Number of removed entries
+    '''
+    def expire(self):
+        with self.lock:
+            now = self.clock()
+            e = self.expiry
+            order = self.order
+            n = 0
+            while e and e[0][0] <= now:
+                t, seq, path = heapq.heappop(e)
+                x = order.get(path)
+                if x is None or x[3] != seq:
+                    continue
+                self.expired += 1
+                n += 1
+                self.remove(path)
+            return n
+
+    ''' Records a read
+        @param [in] path    - Key path that was read
+        @param [in] found   - True if the value existed
+    '''
+    def access(self, path, found):
+        n = self.tree
+        for k in path:
+            n = n[1].get(k)
+            if n is None:
+                break
+            x = n[0]
+            if x is not None:
+                if found:
+                    self.hits += 1
+                    self.touch(x)
+                else:
+                    self.misses += 1
+                return
+        if not found:
+            self.misses += 1
+
+    ''' Marks an entry as used
+    '''
+    def touch(self, x):
+        if self.lfu:
+            x[2] += 1
+            self.seq += 1
+            self.push(self.uses, (x[2], self.seq, x[0]))
+        else:
+            self.order.move_to_end(x[0])
+
+    ''' Adds to a heap, rebuilding it when outdated items pile up
+    '''
+    def push(self, heap, item):
+        heapq.heappush(heap, item)
+        if len(heap) > 2 * len(self.order) + 64:
+            self.rebuild()
+
+    ''' Rebuilds the heaps from the live entries
+    '''
+    def rebuild(self):
+        self.expiry = [(x[1], x[3], p) for p, x in self.order.items() if x[1] is not None]
+        heapq.heapify(self.expiry)
+        if self.lfu:
+            self.uses = [(x[2], x[3], p) for p, x in self.order.items()]
+            heapq.heapify(self.uses)
+
+    ''' Returns the time to live for a new entry
+    '''
+    def ttlFor(self, path):
+        if self.pending is not None:
+            return self.pending
+        ttl = self.ttl
+        # Nodes are kept from least to most specific, the last rule found wins
+        nodes = [self.rules]
+        for k in path:
+            nxt = []
+            for n in nodes:
+                for c in (n[1].get('*'), n[1].get(k)):
+                    if c is not None:
+                        nxt.append(c)
+            if not nxt:
+                break
+            for c in nxt:
+                if c[0] is not _MISS:
+                    ttl = c[0]
+            nodes = nxt
+        return ttl
+
+    ''' Write hook, keeps the entries in step with the bag
+    '''
+    def record(self, op, path, d, k, v):
+        if 'make' == op:
+            return
+        with self.lock:
+            if 'replace' == op:
+                self.clear()
+                return
+            n = self.tree
+            last = len(path) - 1
+            for i, k in enumerate(path):
+                c = n[1].get(k)
+                if c is None:
+                    if 'del' == op:
+                        return
+                    c = n[1][k] = [None, {}]
+                if c[0] is not None and i < last:
+                    # Change inside an entry
+                    if 'set' == op:
+                        self.touch(c[0])
+                    return
+                n = c
+            self.drop(n)
+            if 'del' == op:
+                self.prune(path)
+                return
+            ttl = self.ttlFor(path)
+            now = self.clock()
+            self.seq += 1
+            x = n[0] = [path, now + ttl if ttl else None, 0, self.seq]
+            self.order[path] = x
+            if x[1] is not None:
+                self.push(self.expiry, (x[1], self.seq, path))
+            if self.lfu:
+                self.push(self.uses, (0, self.seq, path))
+            if self.max_entries is not None:
+                while len(self.order) > self.max_entries:
+                    if not self.evict(path):
+                        break
+
+    ''' Forgets the entries at and below a trie node
+    '''
+    def drop(self, top):
+        order = self.order
+        stack = [top]
+        while stack:
+            n = stack.pop()
+            if n[0] is not None:
+                order.pop(n[0][0], None)
+                n[0] = None
+            stack.extend(n[1].values())
+        top[1].clear()
+
+    ''' Removes the trie nodes left empty along a path
+    '''
+    def prune(self, path):
+        nodes = [self.tree]
+        for k in path:
+            c = nodes[-1][1].get(k)
+            if c is None:
+                break
+            nodes.append(c)
+        for i in range(len(nodes) - 1, 0, -1):
+            n = nodes[i]
+            if n[0] is not None or n[1]:
+                break
+            del nodes[i - 1][1][path[i - 1]]
+
+    ''' Evicts one entry
+        @param [in] keep    - Path of the entry being added, not evicted
+
+        @returns False if there was nothing to evict
+    '''
+    def evict(self, keep):
+        order = self.order
+        if self.lfu:
+            u = self.uses
+            held = None
+            while u:
+                item = heapq.heappop(u)
+                cnt, _, path = item
+                x = order.get(path)
+                if x is None or x[2] != cnt:
+                    continue
+                if path == keep:
+                    # Put back once another entry is found
+                    held = item
+                    continue
+                break
+            else:
+                path = None
+            if held is not None:
+                heapq.heappush(u, held)
+            if path is None:
+                return False
+        else:
+            path = next(iter(order))
+            if path == keep:
+                return False
+        self.evictions += 1
+        self.remove(path)
+        return True
+
+    ''' Deletes the value of an entry through the bag, so other hooks see it
+    '''
+    def remove(self, path):
+        bag = self.bag
+        d = bag.__dict__['pb']
+        for k in path[:-1]:
+            d = d.get(k) if isinstance(d, dict) else None
+            if d is None:
+                break
+        k = path[-1]
+        if isinstance(d, dict) and k in d:
+            h = bag._hookList()
+            if h:
+                bag._notify(h, 'del', path, d, k)
+            del d[k]
+        else:
+            self.record('del', path, None, k, None)
+
+    ''' Forgets all entries
+    '''
+    def clear(self):
+        self.tree = [None, {}]
+        self.order.clear()
+        self.expiry = []
+        self.uses = []
+
+    ''' Starts the background sweep
+    '''
+    def start(self, interval):
+        stop = threading.Event()
+        ref = weakref.ref(self)
+        def sweep():
+            while not stop.wait(interval):
+                c = ref()
+                if c is None:
+                    return
+                c.tick()
+                del c
+        t = threading.Thread(target=sweep, name='propertybag-sweep', daemon=True)
+        self.sweeper = (t, stop)
+        t.start()
+
+    ''' Stops the background sweep
+    '''
+    def stop(self):
+        if self.sweeper is not None:
+            t, stop = self.sweeper
+            self.sweeper = None
+            stop.set()
+            t.join()
+
+
+#==================================================================================================
+''' class CacheView
+
+    Bag returned for nested dicts of a CacheBag, removes due entries and
+    counts hits and misses on reads.
+'''
+class CacheView(Bag):
+
+    ''' Returns the Cache of the root CacheBag
+    '''
+    def _cacheState(self):
+        return self._rootBag().__dict__['_cache']
+
+    def _keys(self, ks, sep):
+        if isinstance(ks, str):
+            return self.__dict__['_path'] + (tuple(ks.split(sep)) if ks else ())
+        return self.__dict__['_path'] + (ks,)
+
+    def get(self, ks, defval=None, sep='.'):
+        c = self._cacheState()
+        with c.lock:
+            c.tick()
+            r = Bag.get(self, ks, _MISS, sep)
+            c.access(self._keys(ks, sep), r is not _MISS)
+        return defval if r is _MISS else r
+
+    def bag(self, ks, defval=None, sep='.'):
+        c = self._cacheState()
+        with c.lock:
+            c.tick()
+            r = Bag.bag(self, ks, _MISS, sep)
+            c.access(self._keys(ks, sep), r is not _MISS)
+        return defval if r is _MISS else r
+
+    def exists(self, ks, sep='.'):
+        c = self._cacheState()
+        with c.lock:
+            c.tick()
+            r = Bag.exists(self, ks, sep)
+            c.access(self._keys(ks, sep), r)
+        return r
+
+    ''' Set value using compound key
+        @param [in] ks      - Compound key
+        @param [in] val     - New value to set
+        @param [in] sep     - Key separator
+        @param [in] ttl     - Seconds to live for a new entry, None for the default
+    '''
+    def set(self, ks, val, sep='.', ttl=None):
+        c = self._cacheState()
+        with c.lock:
+            c.tick()
+            c.pending = ttl
+            try:
+                return Bag.set(self, ks, val, sep)
+            finally:
+                c.pending = None
+
+    def __getattr__(self, k):
+        if '__' == k[:2]:
+            return Bag.__getattr__(self, k)
+        c = self._cacheState()
+        with c.lock:
+            c.tick()
+            r = Bag.__getattr__(self, k)
+            c.access(self.__dict__['_path'] + (k,), not isinstance(r, PlaceHolder))
+        return r
+
+    def __getitem__(self, k):
+        c = self._cacheState()
+        with c.lock:
+            c.tick()
+            r = Bag.__getitem__(self, k)
+            c.access(self.__dict__['_path'] + (k,), not isinstance(r, PlaceHolder))
+        return r
+
+    def __contains__(self, k):
+        self._cacheState().tick()
+        return Bag.__contains__(self, k)
+
+    def __len__(self):
+        self._cacheState().tick()
+        return Bag.__len__(self)
+
+    def __iter__(self):
+        self._cacheState().tick()
+        return Bag.__iter__(self)
+
+    def __eq__(self, other):
+        self._cacheState().tick()
+        return Bag.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._cacheState().tick()
+        return Bag.__ne__(self, other)
+
+    def __repr__(self):
+        self._cacheState().tick()
+        return Bag.__repr__(self)
+
+    def as_dict(self):
+        self._cacheState().tick()
+        return Bag.as_dict(self)
+
+    def items(self):
+        self._cacheState().tick()
+        return Bag.items(self)
+
+    def keys(self):
+        self._cacheState().tick()
+        return Bag.keys(self)
+
+    def values(self):
+        self._cacheState().tick()
+        return Bag.values(self)
+
+    def to_json(self, pretty=False, indent=2, sort_keys=True):
+        self._cacheState().tick()
+        return Bag.to_json(self, pretty, indent, sort_keys)
+
+    toJson = to_json
+
+CacheView._View = CacheView
+
+
+#==================================================================================================
+''' class CacheBag
+
+    Bag with expiring entries and a size limit, see the module description.
+    Values the bag is created with are not entries and never expire.
+'''
+class CacheBag(CacheView):
+
+    ''' Constructor
+        @param [in] _i              - dict to initialize object with
+        @param [in] ttl             - Default seconds to live, None to never expire
+        @param [in] max_entries     - Maximum number of entries, None for no limit
+        @param [in] policy          - Eviction policy, 'lru' or 'lfu'
+        @param [in] sweep           - Seconds between background sweeps, None
+                                      to only remove due entries on access
+        @param [in] clock           - Time source, in seconds
+        @param [in] _defstr         - Default string value when non exists
+        @param [in] _defval         - Default value when non exists
+    '''
+    def __init__(self, _i=None, ttl=None, max_entries=None, policy='lru', sweep=None,
+                 clock=time.monotonic, _defstr=ValueError, _defval=None):
+        Bag.__init__(self, _i, _defstr, _defval)
+        c = Cache(self, ttl, max_entries, policy, clock)
+        self.__dict__['_cache'] = c
+        self.add_hook(c.record)
+        if sweep:
+            c.start(sweep)
+
+    ''' Sets the time to live for entries created at or below a key path
+        @param [in] ks      - Compound key, '*' matches any key
+        @param [in] ttl     - Seconds to live, None to never expire
+        @param [in] sep     - Key separator
+
+        The most specific matching rule wins, that is the deepest one and
+        among those the one with a key where the others have '*'. Applies
+        to entries created after the call.
+    '''
+    def set_ttl(self, ks, ttl, sep='.'):
+        c = self.__dict__['_cache']
+        with c.lock:
+            n = c.rules
+            for k in ks.split(sep) if isinstance(ks, str) else (ks,):
+                n = n[1].setdefault(k, [_MISS, {}])
+            n[0] = ttl
+
+    ''' Alias for set_ttl()
+    '''
+    setTtl = set_ttl
+
+    ''' Removes all entries that are due
+        @returns Number of removed entries
+    '''
+    def expire(self):
+        return self.__dict__['_cache'].expire()
+
+    ''' Returns cache statistics
+
+        @returns dict with 'entries', 'hits', 'misses', 'evictions' and 'expired'
+    '''
+    def stats(self):
+        c = self.__dict__['_cache']
+        return {'entries': len(c.order), 'hits': c.hits, 'misses': c.misses,
+                'evictions': c.evictions, 'expired': c.expired}
+
+    ''' Stops the background sweep
+    '''
+    def close(self):
+        self.__dict__['_cache'].stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, e, tb):
+        self.close()
+        return False
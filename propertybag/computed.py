@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+from . propertybag import Bag
+from . import fingerprint as _fingerprint
+
+''' Computed properties
+
+    A computed property is a key path whose value is returned by a
+    function of the bag. The function gets a Tracker view of the bag that
+    records every key path it reads, and the result is stored in the bag
+    like any other value, so reading a computed value costs the same as
+    reading a plain one.
+
+    When a key path the function read is changed through the Bag API, the
+    stored value is removed, along with those of the computed properties
+    that read it, and computed again on the next read.
+
+    @begincode
+
+        cfg = pb.Bag({'db': {'host': 'localhost', 'port': 5432, 'name': 'app'}})
+        cfg.compute('db.url', lambda b: 'postgres://%s:%d/%s' % (b.db.host, b.db.port, b.db.name))
+
+        print(cfg.db.url)               # Computes the url
+        print(cfg.db.url)               # Stored value
+        cfg.db.port = 5433              # Removes the stored url
+        print(cfg.get('db.url'))        # Computes it again
+
+    @endcode
+'''
+
+_MISS = object()
+
+
+''' Returns a new trie node
+'''
+def node(v=None):
+    return [v, {}]
+
+
+#==================================================================================================
+''' class Derived
+
+    A registered computed property
+'''
+class Derived():
+
+    def __init__(self, path, base, fn):
+        self.path = path
+        self.base = base
+        self.fn = fn
+        self.dirty = True
+        self.deps = ()
+        self.read = ()
+
+
+#==================================================================================================
+''' class Computed
+
+    Computed properties of a bag tree, installed as its write hook.
+
+    'paths' is a trie of [Derived, {key: node}] nodes for the computed key
+    paths and 'deps' a trie of [set of Derived, {key: node}] nodes for the
+    key paths they read.
+'''
+class Computed():
+
+    def __init__(self, root):
+        self.root = root
+        self.paths = node()
+        self.deps = node(set())
+        self.dirty = 0
+        self.active = set()
+
+    ''' Registers a computed property
+        @param [in] base    - Key path of the bag the function is called with
+        @param [in] keys    - Key path of the property relative to base
+        @param [in] fn      - Function called with a Tracker for base
+    '''
+    def add(self, base, keys, fn):
+        if not keys:
+            raise ValueError('Computed property needs a key')
+        path = base + keys
+        n = self.paths
+        for k in path:
+            n = n[1].setdefault(k, node())
+        if n[0] is not None:
+            self.invalidate(n[0])
+            if n[0].dirty:
+                self.dirty -= 1
+        else:
+            found, v = self.lookup(path)
+            if found:
+                raise ValueError('Key already has a value : %s' % '.'.join(str(k) for k in path))
+        n[0] = Derived(path, base, fn)
+        self.dirty += 1
+
+    ''' Unregisters a computed property and removes its value
+    '''
+    def remove(self, path):
+        n = self.paths
+        for k in path:
+            n = n[1].get(k)
+            if n is None:
+                return False
+        e = n[0]
+        if e is None:
+            return False
+        self.invalidate(e)
+        self.dirty -= 1
+        n[0] = None
+        return True
+
+    ''' Returns (found, value) for a key path
+    '''
+    def lookup(self, path):
+        d = self.root.__dict__['pb']
+        for k in path:
+            if not isinstance(d, dict) or k not in d:
+                return False, None
+            d = d[k]
+        return True, d
+
+    ''' Stores or removes a computed value, bypassing the write hooks
+        @param [in] path    - Key path
+        @param [in] v       - Value, _MISS to remove
+    '''
+    def store(self, path, v):
+        rd = self.root.__dict__
+        d = rd['pb']
+        for k in path[:-1]:
+            n = d.get(k)
+            if not isinstance(n, dict):
+                if v is _MISS:
+                    return
+                n = d[k] = dict()
+            d = n
+        if v is _MISS:
+            d.pop(path[-1], None)
+        else:
+            d[path[-1]] = v
+        # Computed values are part of the content
+        fp = rd.get('_fp')
+        if fp is not None:
+            _fingerprint.invalidate(fp, path)
+
+    ''' Computes and stores the value of a computed property
+    '''
+    def compute(self, e):
+        if e in self.active:
+            raise ValueError('Circular computed property : %s' % '.'.join(str(k) for k in e.path))
+        found, base = self.lookup(e.base)
+        if not found or not isinstance(base, dict):
+            base = dict()
+        t = Tracker.over(self.root, e.base, base)
+        self.active.add(e)
+        try:
+            v = e.fn(t)
+        finally:
+            self.active.discard(e)
+        if isinstance(v, Bag):
+            v = v.as_dict()
+        if e.dirty:
+            e.dirty = False
+            self.dirty -= 1
+        e.read = tuple(t.__dict__['_deps'])
+        self.link(e)
+        self.store(e.path, v)
+        return v
+
+    ''' Adds a computed property to the dependency trie at the key paths
+        it read the last time it was computed
+    '''
+    def link(self, e):
+        e.deps = e.read
+        for p in e.deps:
+            n = self.deps
+            for k in p:
+                c = n[1].get(k)
+                if c is None:
+                    c = n[1][k] = node(set())
+                n = c
+            n[0].add(e)
+
+    ''' Computes the computed properties without a value, except the
+        ones being computed
+        @param [in] n   - Node of the paths trie to start at, None for all
+    '''
+    def refresh(self, n=None):
+        stack = [self.paths if n is None else n]
+        while stack:
+            n = stack.pop()
+            if n[0] is not None and n[0].dirty and n[0] not in self.active:
+                self.compute(n[0])
+            stack.extend(n[1].values())
+
+    ''' Handles a read that found nothing
+        @param [in] keys    - Key path that was read
+        @param [in] defval  - Value to return if it is not computed
+
+        @returns The computed value at keys, or defval
+    '''
+    def missing(self, keys, defval):
+        n = self.paths
+        last = len(keys) - 1
+        for i, k in enumerate(keys):
+            n = n[1].get(k)
+            if n is None:
+                return defval
+            e = n[0]
+            if e is None:
+                continue
+            if e.dirty or i == last:
+                v = self.compute(e)
+            else:
+                found, v = self.lookup(e.path)
+                if not found:
+                    v = self.compute(e)
+            for k in keys[i + 1:]:
+                if not isinstance(v, dict) or k not in v:
+                    return defval
+                v = v[k]
+            return v
+        # Computed properties below keys create the dicts above them
+        self.refresh(n)
+        found, v = self.lookup(keys)
+        return v if found else defval
+
+    ''' Removes the value of a computed property and of those depending on it
+        @param [in] e       - Derived to invalidate
+        @param [in] keep    - Key path whose value is left in place
+    '''
+    def invalidate(self, e, keep=None):
+        stack = [e]
+        while stack:
+            e = stack.pop()
+            if e.dirty:
+                continue
+            e.dirty = True
+            self.dirty += 1
+            for p in e.deps:
+                n = self.deps
+                for k in p:
+                    n = n[1].get(k)
+                    if n is None:
+                        break
+                else:
+                    n[0].discard(e)
+            e.deps = ()
+            if e.path != keep:
+                self.store(e.path, _MISS)
+            stack.extend(self.affected(e.path))
+
+    ''' Returns the computed properties affected by a change at a key path
+
+        These are the ones that read the path, a path above it or a path
+        below it, and the ones stored at or below it.
+    '''
+    def affected(self, path):
+        r = []
+        n = self.deps
+        for k in path:
+            r.extend(n[0])
+            n = n[1].get(k)
+            if n is None:
+                break
+        else:
+            stack = [n]
+            while stack:
+                n = stack.pop()
+                r.extend(n[0])
+                stack.extend(n[1].values())
+        n = self.paths
+        for k in path:
+            n = n[1].get(k)
+            if n is None:
+                break
+        else:
+            stack = [n]
+            while stack:
+                n = stack.pop()
+                if n[0] is not None:
+                    r.append(n[0])
+                stack.extend(n[1].values())
+        return r
+
+    ''' Write hook, removes the values affected by a change
+
+        Setting a computed property keeps the key paths it read, so the new
+        value is replaced once one of them changes, as a rolled back
+        transaction expects. Deleting it leaves the value for the change
+        itself to remove.
+    '''
+    def record(self, op, path, d, k, v):
+        if 'replace' == op:
+            stack = [self.paths]
+            while stack:
+                n = stack.pop()
+                if n[0] is not None:
+                    self.invalidate(n[0])
+                stack.extend(n[1].values())
+            return
+        n = self.paths
+        for k in path:
+            n = n[1].get(k)
+            if n is None:
+                break
+        own = None if n is None else n[0]
+        for e in self.affected(path):
+            if e is not own:
+                self.invalidate(e)
+            elif 'del' == op:
+                self.invalidate(e, path)
+            elif e.dirty:
+                e.dirty = False
+                self.dirty -= 1
+                self.link(e)
+
+
+#==================================================================================================
+''' class Tracker
+
+    Bag passed to the function of a computed property, records the key
+    paths that are read through it.
+'''
+class Tracker(Bag):
+
+    ''' Returns a Tracker for the dict at a key path
+    '''
+    @staticmethod
+    def over(root, path, d):
+        t = dict.__new__(Tracker)
+        dict.__init__(t, _='_')
+        td = t.__dict__
+        td['defstr'] = root.__dict__['defstr']
+        td['defval'] = root.__dict__['defval']
+        td['pb'] = d
+        td['_root'] = root
+        td['_path'] = path
+        td['_hooks'] = root.__dict__['_hooks']
+        td['_deps'] = set()
+        return t
+
+    def _sub(self, keys, v):
+        b = Bag._sub(self, keys, v)
+        b.__dict__['_deps'] = self.__dict__['_deps']
+        return b
+
+    def _read(self, keys):
+        self.__dict__['_deps'].add(self.__dict__['_path'] + keys)
+
+    def _split(self, ks, sep):
+        if isinstance(ks, str):
+            return tuple(ks.split(sep)) if ks else ()
+        return (ks,)
+
+    def get(self, ks, defval=None, sep='.'):
+        self._read(self._split(ks, sep))
+        return Bag.get(self, ks, defval, sep)
+
+    def bag(self, ks, defval=None, sep='.'):
+        r = Bag.bag(self, ks, _MISS, sep)
+        if not isinstance(r, Bag):
+            self._read(self._split(ks, sep))
+        return defval if r is _MISS else r
+
+    def exists(self, ks, sep='.'):
+        self._read(self._split(ks, sep))
+        return Bag.exists(self, ks, sep)
+
+    def __getattr__(self, k):
+        r = Bag.__getattr__(self, k)
+        if '__' != k[:2] and not isinstance(r, Bag):
+            self._read((k,))
+        return r
+
+    def __getitem__(self, k):
+        r = Bag.__getitem__(self, k)
+        if not isinstance(r, Bag):
+            self._read((k,))
+        return r
+
+    def __contains__(self, k):
+        self._read((k,))
+        return Bag.__contains__(self, k)
+
+    def __len__(self):
+        self._read(())
+        return Bag.__len__(self)
+
+    def __iter__(self):
+        self._read(())
+        return Bag.__iter__(self)
+
+    def as_dict(self):
+        self._read(())
+        return Bag.as_dict(self)
+
+    def items(self):
+        self._read(())
+        return Bag.items(self)
+
+    def keys(self):
+        self._read(())
+        return Bag.keys(self)
+
+    def values(self):
+        self._read(())
+        return Bag.values(self)
+
+    def to_json(self, pretty=False, indent=2, sort_keys=True):
+        self._read(())
+        return Bag.to_json(self, pretty, indent, sort_keys)
+
+    toJson = to_json
+
+Tracker._View = Tracker
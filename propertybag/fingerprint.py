@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+from hashlib import blake2b
+
+''' Content fingerprints for nested dicts
+
+    The fingerprint of a dict is a hash over its sorted entries, where a
+    nested dict contributes its own fingerprint, so equal contents give
+    equal fingerprints regardless of insertion order. Numbers are
+    normalized the way == compares them (1 == 1.0 == True).
+
+    Fingerprints are cached in a trie of nodes [fingerprint, {key: node}]
+    that follows the key paths of the tree. A change at a path clears the
+    cached fingerprints along that path and drops the node of the changed
+    key, so unchanged subtrees keep theirs.
+
+    Values should be json like, other objects are hashed by type and repr().
+'''
+
+_DIGEST = 16
+
+
+''' Returns a new trie node
+'''
+def node():
+    return [None, {}]
+
+''' Returns the text encoding of a value that is not a dict
+    @param [in] v   - Value to encode
+'''
+def encodeLeaf(v):
+    c = v.__class__
+    if c is str:
+        return 's' + v
+    if c is int or c is bool:
+        return 'i%d' % v
+    if c is float:
+        if v.is_integer():
+            return 'i%d' % v
+        return 'f' + repr(v)
+    if v is None:
+        return 'n'
+    if c is list or c is tuple:
+        r = ['l' if c is list else 't']
+        for i in v:
+            e = digest(i, node()) if isinstance(i, dict) else encodeLeaf(i)
+            r.append('%d:%s' % (len(e), e))
+        return ''.join(r)
+    if isinstance(v, dict):
+        return digest(v, node())
+    return 'o%s.%s:%r' % (c.__module__, c.__qualname__, v)
+
+''' Returns the fingerprint of a dict, using and filling the cache
+    @param [in] d   - dict to fingerprint
+    @param [in] n   - Trie node for d
+'''
+def digest(d, n):
+    h = n[0]
+    if h is not None:
+        return h
+    ch = n[1]
+    r = []
+    add = r.append
+    for k, v in d.items():
+        ke = 's' + k if k.__class__ is str else encodeLeaf(k)
+        c = v.__class__
+        # Inlined common cases of encodeLeaf()
+        if c is str:
+            ve = 's' + v
+        elif c is int:
+            ve = 'i%d' % v
+        elif isinstance(v, dict):
+            c = ch.get(k)
+            if c is None:
+                c = ch[k] = node()
+            ve = digest(v, c)
+        else:
+            ve = encodeLeaf(v)
+        add('%d:%s%d:%s' % (len(ke), ke, len(ve), ve))
+    r.sort()
+    h = 'd' + blake2b('\n'.join(r).encode('utf-8', 'surrogatepass'), digest_size=_DIGEST).hexdigest()
+    n[0] = h
+    return h
+
+''' Clears the cached fingerprints along a changed key path
+    @param [in] n       - Root trie node
+    @param [in] path    - Key path of the changed key
+'''
+def invalidate(n, path):
+    n[0] = None
+    for k in path[:-1]:
+        n = n[1].get(k)
+        if n is None:
+            return
+        n[0] = None
+    n[1].pop(path[-1], None)
+
+''' Returns the value and trie node at a key path
+    @param [in] d       - Root dict
+    @param [in] n       - Root trie node
+    @param [in] path    - Key path
+
+    @returns Tuple (found, value, node), node is None if the value is not a dict
+'''
+def lookup(d, n, path):
+    for k in path:
+        if not isinstance(d, dict) or k not in d:
+            return False, None, None
+        d = d[k]
+        if n is not None:
+            c = n[1].get(k)
+            if c is None and isinstance(d, dict):
+                c = n[1][k] = node()
+            n = c
+    return True, d, n if isinstance(d, dict) else None
+
+''' Returns the fingerprint of any value
+    @param [in] v   - Value
+    @param [in] n   - Trie node if v is a dict, None for no caching
+'''
+def fingerprint(v, n=None):
+    if isinstance(v, dict):
+        return digest(v, n if n is not None else node())
+    return 'v' + blake2b(encodeLeaf(v).encode('utf-8', 'surrogatepass'), digest_size=_DIGEST).hexdigest()
+
+''' Returns the key paths at which two dicts differ
+    @param [in] a       - First dict
+    @param [in] na      - Trie node for a
+    @param [in] b       - Second dict
+    @param [in] nb      - Trie node for b
+
+    Subtrees with equal fingerprints are skipped, so the work is
+    proportional to the number of changes times their depth.
+
+    @returns List of key path tuples, keys present on one side only included
+'''
+def diff(a, na, b, nb):
+    r = []
+    stack = [((), a, na, b, nb)]
+    while stack:
+        path, a, na, b, nb = stack.pop()
+        if digest(a, na) == digest(b, nb):
+            continue
+        for k, va in a.items():
+            if k not in b:
+                r.append(path + (k,))
+                continue
+            vb = b[k]
+            if isinstance(va, dict) and isinstance(vb, dict):
+                ca = na[1].get(k)
+                if ca is None:
+                    ca = na[1][k] = node()
+                cb = nb[1].get(k)
+                if cb is None:
+                    cb = nb[1][k] = node()
+                stack.append((path + (k,), va, ca, vb, cb))
+            elif isinstance(va, dict) or isinstance(vb, dict) or encodeLeaf(va) != encodeLeaf(vb):
+                r.append(path + (k,))
+        for k in b:
+            if k not in a:
+                r.append(path + (k,))
+    return r
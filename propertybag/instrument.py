@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import time
+import threading
+
+from . propertybag import Bag, PlaceHolder
+
+''' Access instrumentation
+
+    Counts reads, writes and misses per key path and samples latencies
+    of Bag accesses. Instrumentation works by swapping the Bag and
+    PlaceHolder methods for counting wrappers in enable() and putting
+    the originals back in disable(), so it costs nothing while disabled.
+
+    @begincode
+
+        from propertybag import instrument
+
+        instrument.enable(sample_rate=0.01)
+        ...
+        print(instrument.report(20))
+        instrument.disable()
+
+    @endcode
+'''
+
+READS = 0
+WRITES = 1
+MISSES = 2
+SAMPLES = 3
+TIME = 4
+MAXTIME = 5
+
+OTHER = '<other>'
+
+_MISS = object()
+_lock = threading.Lock()
+_orig = {}
+_stats = {}
+_cfg = {'every': 0, 'tick': 0, 'max_paths': 0}
+
+
+''' Returns the key path of a Bag or PlaceHolder as a string
+'''
+def _base(o):
+    if isinstance(o, PlaceHolder):
+        o = o.__dict__['_bag']
+        if o is None:
+            return ''
+    return '.'.join(k if isinstance(k, str) else str(k) for k in o.__dict__['_path'])
+
+def _join(base, k, sep='.'):
+    if not isinstance(k, str):
+        k = str(k)
+    elif '.' != sep:
+        k = k.replace(sep, '.')
+    return base + '.' + k if base else k
+
+''' Returns True if this call should be timed
+'''
+def _sample():
+    e = _cfg['every']
+    if not e:
+        return False
+    _cfg['tick'] -= 1
+    if 0 < _cfg['tick']:
+        return False
+    _cfg['tick'] = e
+    return True
+
+''' Records an access
+    @param [in] path    - Key path
+    @param [in] op      - READS or WRITES
+    @param [in] miss    - True if the key did not exist
+    @param [in] dt      - Sampled latency in seconds or None
+'''
+def _record(path, op, miss, dt):
+    s = _stats.get(path)
+    if s is None:
+        with _lock:
+            if len(_stats) >= _cfg['max_paths'] and path not in _stats:
+                path = OTHER
+            s = _stats.setdefault(path, [0, 0, 0, 0, 0.0, 0.0])
+    s[op] += 1
+    if miss:
+        s[MISSES] += 1
+    if dt is not None:
+        s[SAMPLES] += 1
+        s[TIME] += dt
+        if dt > s[MAXTIME]:
+            s[MAXTIME] = dt
+
+def _call(f, *args):
+    if not _sample():
+        return f(*args), None
+    t = time.perf_counter()
+    r = f(*args)
+    return r, time.perf_counter() - t
+
+
+#--------------------------------------------------------------------------------------------------
+# Wrappers
+
+def _wrapLookup(f):
+    def lookup(self, ks, defval=None, sep='.'):
+        r, dt = _call(f, self, ks, _MISS, sep)
+        _record(_join(_base(self), ks, sep), READS, r is _MISS, dt)
+        return defval if r is _MISS else r
+    return lookup
+
+def _wrapExists(f):
+    def exists(self, ks, sep='.'):
+        r, dt = _call(f, self, ks, sep)
+        _record(_join(_base(self), ks, sep), READS, not r, dt)
+        return r
+    return exists
+
+def _wrapSet(f):
+    def set(self, ks, val, sep='.'):
+        r, dt = _call(f, self, ks, val, sep)
+        _record(_join(_base(self), ks, sep) if ks else _base(self), WRITES, False, dt)
+        return r
+    return set
+
+def _wrapDelete(f):
+    def delete(self, ks, sep='.'):
+        r, dt = _call(f, self, ks, sep)
+        _record(_join(_base(self), ks, sep), WRITES, not r, dt)
+        return r
+    return delete
+
+def _wrapGet(f):
+    def get(self, k):
+        if isinstance(k, str) and '__' == k[:2]:
+            return f(self, k)
+        r, dt = _call(f, self, k)
+        _record(_join(_base(self), k), READS, isinstance(r, PlaceHolder), dt)
+        return r
+    return get
+
+def _wrapPut(f):
+    def put(self, k, *args):
+        r, dt = _call(f, self, k, *args)
+        _record(_join(_base(self), k), WRITES, False, dt)
+        return r
+    return put
+
+def _wrapHolderSet(f):
+    def put(self, k, v):
+        r, dt = _call(f, self, k, v)
+        p = _base(self)
+        for i in self.__dict__['k']:
+            p = _join(p, i)
+        _record(_join(p, k), WRITES, False, dt)
+        return r
+    return put
+
+_WRAPPERS = (
+    (Bag, 'get', _wrapLookup),
+    (Bag, 'bag', _wrapLookup),
+    (Bag, 'exists', _wrapExists),
+    (Bag, 'set', _wrapSet),
+    (Bag, 'delete', _wrapDelete),
+    (Bag, '__getattr__', _wrapGet),
+    (Bag, '__getitem__', _wrapGet),
+    (Bag, '__setattr__', _wrapPut),
+    (Bag, '__setitem__', _wrapPut),
+    (Bag, '__delattr__', _wrapPut),
+    (Bag, '__delitem__', _wrapPut),
+    (PlaceHolder, '__setattr__', _wrapHolderSet),
+)
+
+
+#--------------------------------------------------------------------------------------------------
+# Public functions
+
+''' Enables instrumentation
+    @param [in] sample_rate - Fraction of calls to time, 0 disables timing
+    @param [in] max_paths   - Maximum number of distinct paths to track,
+                              further paths are counted under '<other>'
+'''
+def enable(sample_rate=0.01, max_paths=10000):
+    if 0 >= sample_rate:
+        every = 0
+    else:
+        every = max(1, int(round(1.0 / min(1.0, sample_rate))))
+    _cfg['every'] = every
+    _cfg['tick'] = every
+    _cfg['max_paths'] = max_paths
+    with _lock:
+        if _orig:
+            return
+        for cls, name, wrap in _WRAPPERS:
+            f = cls.__dict__[name]
+            _orig[(cls, name)] = f
+            w = wrap(f)
+            w.__name__ = name
+            w.__doc__ = f.__doc__
+            setattr(cls, name, w)
+
+''' Disables instrumentation and restores the original methods
+
+    Collected statistics are kept until reset() is called.
+'''
+def disable():
+    with _lock:
+        for (cls, name), f in _orig.items():
+            setattr(cls, name, f)
+        _orig.clear()
+
+''' Returns True if instrumentation is enabled
+'''
+def enabled():
+    return bool(_orig)
+
+''' Clears collected statistics
+'''
+def reset():
+    with _lock:
+        _stats.clear()
+
+''' Returns the collected statistics
+
+    @returns dict of key path to dict with 'reads', 'writes', 'misses',
+             'samples', 'time' (sampled seconds) and 'max' (seconds)
+'''
+def stats():
+    with _lock:
+        items = list(_stats.items())
+    return {p: {'reads': s[READS], 'writes': s[WRITES], 'misses': s[MISSES],
+                'samples': s[SAMPLES], 'time': s[TIME], 'max': s[MAXTIME]}
+            for p, s in items}
+
+''' Returns the hottest paths
+    @param [in] top     - Maximum number of paths to return, 0 for all
+    @param [in] key     - Sort key, 'total', 'reads', 'writes', 'misses' or 'time'
+
+    @returns List of (path, stats) tuples sorted hottest first
+'''
+def hot(top=20, key='total'):
+    st = stats()
+    if 'total' == key:
+        f = lambda i: i[1]['reads'] + i[1]['writes']
+    else:
+        f = lambda i: i[1][key]
+    r = sorted(st.items(), key=f, reverse=True)
+    return r[:top] if top else r
+
+''' Returns a text report of the hottest paths
+    @param [in] top     - Maximum number of paths to list, 0 for all
+    @param [in] key     - Sort key, see hot()
+'''
+def report(top=20, key='total'):
+    lines = ['%-40s %10s %10s %10s %12s' % ('path', 'reads', 'writes', 'misses', 'mean us')]
+    for p, s in hot(top, key):
+        mean = (1e6 * s['time'] / s['samples']) if s['samples'] else 0.0
+        lines.append('%-40s %10d %10d %10d %12.3f' % (p, s['reads'], s['writes'], s['misses'], mean))
+    return '\n'.join(lines)
+
+''' Returns the statistics as flat Prometheus style metrics
+    @param [in] prefix  - Metric name prefix
+
+    @returns dict of 'name{path="..."}' to value
+'''
+def metrics(prefix='propertybag'):
+    r = {}
+    for p, s in stats().items():
+        lbl = '{path="%s"}' % p.replace('\\', '\\\\').replace('"', '\\"')
+        r['%s_reads_total%s' % (prefix, lbl)] = s['reads']
+        r['%s_writes_total%s' % (prefix, lbl)] = s['writes']
+        r['%s_misses_total%s' % (prefix, lbl)] = s['misses']
+        r['%s_latency_seconds_sum%s' % (prefix, lbl)] = s['time']
+        r['%s_latency_seconds_count%s' % (prefix, lbl)] = s['samples']
+    return r
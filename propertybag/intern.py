@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import sys
+import json
+
+''' Key and value interning for json loading
+
+    json.loads() allocates new strings for every document, so many Bags
+    loaded from similar documents hold many copies of the same keys and
+    values. With interning enabled the loaders share one copy of each key
+    (through sys.intern(), which also lets attribute lookups match keys by
+    identity) and of each short string value, up to a bounded table size.
+
+    Interning is chosen per call with the intern / _intern argument of the
+    loaders, which takes an InternTable, True for the shared table, False
+    to disable it or None for the default set with set_default().
+
+    @begincode
+
+        pb.intern.set_default(True)
+        bags = [pb.Bag(line) for line in open('users.ndjson')]
+
+        t = pb.InternTable(max_entries=10000)
+        table = pb.BagTable.from_ndjson(open('users.ndjson'), intern=t)
+        print(t.stats())
+
+    @endcode
+'''
+
+_intern = sys.intern
+
+
+#==================================================================================================
+''' class InternTable
+
+    Bounded table of shared string values, used as the json object hook.
+'''
+class InternTable():
+
+    ''' Constructor
+        @param [in] values      - True to intern string values as well as keys
+        @param [in] max_len     - Longest string value that is interned
+        @param [in] max_entries - Maximum number of distinct values, once
+                                  full, only values already in the table
+                                  are shared
+    '''
+    def __init__(self, values=True, max_len=32, max_entries=100000):
+        self.values = values
+        self.max_len = max_len
+        self.max_entries = max_entries
+        self.table = {}
+        self.full = False
+        self.decoder = json.JSONDecoder(object_pairs_hook=self.hook())
+
+    ''' Returns the object_pairs_hook for json decoding
+    '''
+    def hook(self):
+        intern = _intern
+        if not self.values:
+            def keys(items):
+                return {intern(k): v for k, v in items}
+            return keys
+
+        t = self.table
+        full = self.full
+        share = t.get if full else t.setdefault
+        max_len = self.max_len
+        max_entries = self.max_entries
+        def pairs(items):
+            d = {}
+            for k, v in items:
+                if v.__class__ is str and len(v) <= max_len:
+                    v = share(v, v)
+                d[intern(k)] = v
+            if not full and len(t) >= max_entries:
+                self.freeze()
+            return d
+        return pairs
+
+    ''' Stops adding values, values already in the table are still shared
+    '''
+    def freeze(self):
+        if not self.full:
+            self.full = True
+            self.decoder = json.JSONDecoder(object_pairs_hook=self.hook())
+
+    ''' Decodes a json string
+        @param [in] s   - json string or bytes
+    '''
+    def loads(self, s):
+        if isinstance(s, (bytes, bytearray)):
+            s = s.decode('utf-8')
+        return self.decoder.decode(s)
+
+    ''' Empties the table
+    '''
+    def clear(self):
+        self.table.clear()
+        self.full = False
+        self.decoder = json.JSONDecoder(object_pairs_hook=self.hook())
+
+    ''' Returns statistics about the table
+
+        @returns dict with 'entries', 'max_entries', 'full' and 'bytes',
+                 the memory held by the shared values
+    '''
+    def stats(self):
+        return {'entries': len(self.table), 'max_entries': self.max_entries,
+                'full': self.full, 'bytes': sum(sys.getsizeof(s) for s in self.table)}
+
+    def __len__(self):
+        return len(self.table)
+
+
+_cfg = {'default': None, 'shared': None}
+
+''' Returns the shared InternTable
+'''
+def shared():
+    t = _cfg['shared']
+    if t is None:
+        t = _cfg['shared'] = InternTable()
+    return t
+
+''' Sets the interning used when a loader is not told otherwise
+    @param [in] t   - InternTable, True for the shared table or False / None to disable
+'''
+def set_default(t):
+    _cfg['default'] = resolve(False if t is None else t)
+
+''' Returns the InternTable to use for a loader argument, or None
+    @param [in] t   - InternTable, True, False or None, see set_default()
+'''
+def resolve(t):
+    if t is None:
+        return _cfg['default']
+    if t is True:
+        return shared()
+    if t is False:
+        return None
+    if not isinstance(t, InternTable):
+        raise ValueError('Invalid intern table : %r' % (t,))
+    return t
+
+''' Decodes a json string, interning keys and values as configured
+    @param [in] s   - json string or bytes
+    @param [in] t   - InternTable, True, False or None, see set_default()
+'''
+def loads(s, t=None):
+    t = resolve(t)
+    if t is None:
+        return json.loads(s)
+    return t.loads(s)
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import re
+import sys
+import json
+from json.decoder import scanstring
+
+from . propertybag import Bag
+from . intern import resolve as resolveIntern
+
+_WS = re.compile(r'[ \t\n\r]*')
+_STR = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(r'[^,}\]\s]+')
+
+# Everything up to the next bracket that is not inside a string
+_RUN = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+
+''' Returns a regex matching a complete '"key": value,' object member
+
+    Values nested deeper than depth levels do not match, the member is
+    then parsed by _member() instead. Needs possessive quantifiers, so
+    returns None on python versions before 3.11.
+'''
+def _memberRegex(depth=8):
+    s = r'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+    run = r'[^"{}\[\]]++'
+    v = r'[\[{](?:%s|%s)*+[\]}]' % (run, s)
+    for _ in range(depth - 1):
+        v = r'[\[{](?:%s|%s|%s)*+[\]}]' % (run, s, v)
+    try:
+        return re.compile(r'[ \t\n\r]*+(%s)[ \t\n\r]*+:[ \t\n\r]*+(%s|%s|[^,}\]\s\[{"]++)[ \t\n\r]*+[,}]' % (s, v, s))
+    except re.error:
+        return None
+
+_MEMBER = _memberRegex()
+
+
+''' Returns the end position of the json value starting at i
+    @param [in] s   - json string
+    @param [in] i   - Start of the value
+'''
+def _skip(s, i):
+    c = s[i]
+    if '{' == c or '[' == c:
+        depth = 0
+        run = _RUN.match
+        try:
+            while True:
+                c = s[i]
+                if '{' == c or '[' == c:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if not depth:
+                        return i + 1
+                i = run(s, i + 1).end()
+        except IndexError:
+            raise ValueError('Unterminated json value')
+    m = (_STR if '"' == c else _SCALAR).match(s, i)
+    if not m:
+        raise ValueError('Invalid json value at %d'%i)
+    return m.end()
+
+''' Parses the object member starting at i without the member regex
+
+    @returns (key, value start, value end, end) where end is just past
+             the ',' or '}' following the value
+'''
+def _member(s, i):
+    ws = _WS.match
+    try:
+        i = ws(s, i).end()
+        if '"' != s[i]:
+            raise ValueError('Expecting property name at %d'%i)
+        k, i = scanstring(s, i + 1)
+        i = ws(s, i).end()
+        if ':' != s[i]:
+            raise ValueError("Expecting ':' at %d"%i)
+        a = ws(s, i + 1).end()
+        b = _skip(s, a)
+        i = ws(s, b).end()
+        if s[i] not in ',}':
+            raise ValueError("Expecting ',' at %d"%i)
+    except IndexError:
+        raise ValueError('Unterminated json object')
+    return k, a, b, i + 1
+
+''' Returns True if key k may be repeated in s after pos
+
+    json keeps the last value of a repeated key. A key written without
+    escapes is its own text between quotes, so a source without that
+    text or any backslash after pos has no repeat.
+'''
+def _repeats(s, pos, k):
+    return 0 <= s.find('"%s"' % k, pos) or 0 <= s.find('\\', pos)
+
+
+#==================================================================================================
+''' class LazyBag
+
+    Bag initialized from a json string that only decodes values when they
+    are first accessed.
+
+    Top level keys are indexed on demand, up to the key being looked for.
+    A value is decoded the first time get(), bag(), exists(), attribute /
+    item access or iteration reaches it and is cached from then on.
+    to_json() copies the raw text of values that were never decoded.
+
+    @begincode
+
+        bag = pb.LazyBag(open('big.json').read())
+        print(bag.a.b)                  # Decodes only 'a'
+        print(bag.to_json())            # Everything else is copied as is
+
+    @endcode
+'''
+class LazyBag(Bag):
+
+    ''' Constructor
+        @param [in] s           - json string or bytes
+        @param [in] _defstr     - Default string value when non exists
+        @param [in] _defval     - Default value when non exists
+        @param [in] _intern     - Key and value interning, see propertybag.intern
+    '''
+    def __init__(self, s, _defstr=ValueError, _defval=None, _intern=None):
+        Bag.__init__(self, None, _defstr, _defval)
+        if isinstance(s, (bytes, bytearray)):
+            s = s.decode('utf-8')
+        it = resolveIntern(_intern)
+        self.__dict__['_loads'] = json.loads if it is None else it.loads
+        self.__dict__['_key'] = None if it is None else sys.intern
+        self.__dict__['_src'] = None
+        self.__dict__['_pos'] = None
+        self.__dict__['_raw'] = {}
+        self.__dict__['_order'] = {}
+        self.__dict__['_lazy'] = False
+        i = _WS.match(s).end()
+        if i >= len(s) or '{' != s[i]:
+            self.__dict__['pb'] = self.__dict__['_loads'](s)
+            return
+        i = _WS.match(s, i + 1).end()
+        if i < len(s) and '}' == s[i]:
+            return
+        self.__dict__['_src'] = s
+        self.__dict__['_pos'] = i
+        self.__dict__['_lazy'] = True
+
+    ''' Indexes top level members until key k is found
+        @param [in] k   - Key to look for, None to index everything
+
+        @returns True if k was found
+    '''
+    def _scan(self, k=None):
+        d = self.__dict__
+        pos = d['_pos']
+        if pos is None:
+            return False
+        s = d['_src']
+        raw = d['_raw']
+        order = d['_order']
+        pb = d['pb']
+        match = _MEMBER.match if _MEMBER is not None else None
+        key = d['_key']
+        found = False
+        while pos is not None:
+            m = match(s, pos) if match else None
+            if m:
+                mk = m.group(1)
+                mk = scanstring(mk, 1)[0] if '\\' in mk else mk[1:-1]
+                a, b = m.span(2)
+                pos = m.end()
+            else:
+                mk, a, b, pos = _member(s, pos)
+            if key is not None:
+                mk = key(mk)
+            if '}' == s[pos - 1]:
+                pos = None
+            if mk in pb or mk in order:
+                # The last value of a repeated key wins, as with json
+                if mk in raw:
+                    raw[mk] = (a, b)
+                continue
+            raw[mk] = (a, b)
+            order[mk] = None
+            if k is not None and mk == k:
+                found = True
+                if pos is None or not _repeats(s, pos, mk):
+                    break
+                k = None
+        d['_pos'] = pos
+        return found
+
+    ''' Returns True if k is a top level key that has not been decoded
+    '''
+    def _isRaw(self, k):
+        d = self.__dict__
+        try:
+            if k in d['_raw']:
+                if d['_pos'] is not None and _repeats(d['_src'], d['_pos'], k):
+                    self._scan()
+                return True
+            return k not in d['pb'] and self._scan(k)
+        except TypeError:
+            return False
+
+    ''' Switches to plain Bag behavior once everything is decoded and indexed
+    '''
+    def _settle(self):
+        d = self.__dict__
+        if d['_raw'] or d['_pos'] is not None:
+            return
+        pb = d['pb']
+        order = d['_order']
+        r = {k: pb[k] for k in order if k in pb}
+        for k in pb:
+            if k not in r:
+                r[k] = pb[k]
+        pb.clear()
+        pb.update(r)
+        d['_lazy'] = False
+        d['_src'] = None
+
+    ''' Decodes the value for key k if it is still raw
+        @param [in] k   - Top level key
+    '''
+    def _load(self, k):
+        if self._isRaw(k):
+            d = self.__dict__
+            a, b = d['_raw'].pop(k)
+            d['pb'][k] = d['_loads'](d['_src'][a:b])
+        self._settle()
+
+    ''' Decodes all remaining raw values
+    '''
+    def _loadAll(self):
+        d = self.__dict__
+        if not d['_lazy']:
+            return
+        self._scan()
+        pb = d['pb']
+        src = d['_src']
+        loads = d['_loads']
+        for k, (a, b) in d['_raw'].items():
+            pb[k] = loads(src[a:b])
+        d['_raw'].clear()
+        self._settle()
+
+    ''' Forgets the raw value of a top level key that is being replaced
+
+        If write hooks are installed the value is decoded instead, so
+        the hooks see the value being replaced.
+    '''
+    def _drop(self, k):
+        if self._hookList():
+            self._load(k)
+            return
+        if self._isRaw(k):
+            del self.__dict__['_raw'][k]
+        self._settle()
+
+    def _first(self, ks, sep):
+        if not isinstance(ks, str):
+            return ks
+        return ks.split(sep, 1)[0]
+
+    ''' Returns True if any value has not been decoded yet
+    '''
+    def is_lazy(self):
+        return self.__dict__['_lazy']
+
+    def __getitem__(self, k):
+        if self.__dict__['_lazy']:
+            self._load(k)
+        return Bag.__getitem__(self, k)
+
+    def __getattr__(self, k):
+        if self.__dict__['_lazy']:
+            self._load(k)
+        return Bag.__getattr__(self, k)
+
+    def __setitem__(self, k, v):
+        if self.__dict__['_lazy']:
+            self._drop(k)
+        Bag.__setitem__(self, k, v)
+
+    def __setattr__(self, k, v):
+        if self.__dict__['_lazy']:
+            self._drop(k)
+        Bag.__setattr__(self, k, v)
+
+    def __delitem__(self, k):
+        if self.__dict__['_lazy']:
+            if self._isRaw(k) and not self._hookList():
+                self.__dict__['_order'].pop(k, None)
+                self._drop(k)
+                return
+            self._load(k)
+            self.__dict__['_order'].pop(k, None)
+            Bag.__delitem__(self, k)
+            self._settle()
+            return
+        Bag.__delitem__(self, k)
+
+    __delattr__ = __delitem__
+
+    def __contains__(self, k):
+        if self.__dict__['_lazy']:
+            return k in self.__dict__['pb'] or self._isRaw(k)
+        return Bag.__contains__(self, k)
+
+    def __len__(self):
+        if self.__dict__['_lazy']:
+            self._scan()
+            return len(self.__dict__['pb']) + len(self.__dict__['_raw'])
+        return Bag.__len__(self)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        self._loadAll()
+        if isinstance(other, LazyBag):
+            other._loadAll()
+        return Bag.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._loadAll()
+        if isinstance(other, LazyBag):
+            other._loadAll()
+        return Bag.__ne__(self, other)
+
+    def __repr__(self):
+        self._loadAll()
+        return Bag.__repr__(self)
+
+    def get(self, ks, defval=None, sep='.'):
+        if self.__dict__['_lazy']:
+            if isinstance(ks, str) and not ks:
+                self._loadAll()
+            else:
+                self._load(self._first(ks, sep))
+        return Bag.get(self, ks, defval, sep)
+
+    def bag(self, ks, defval=None, sep='.'):
+        if self.__dict__['_lazy']:
+            if isinstance(ks, str) and not ks:
+                self._loadAll()
+            else:
+                self._load(self._first(ks, sep))
+        return Bag.bag(self, ks, defval, sep)
+
+    def exists(self, ks, sep='.'):
+        if self.__dict__['_lazy']:
+            k = self._first(ks, sep)
+            if isinstance(ks, str) and ks == k and self._isRaw(k):
+                return True
+            self._load(k)
+        return Bag.exists(self, ks, sep)
+
+    def set(self, ks, val, sep='.'):
+        if self.__dict__['_lazy']:
+            if not ks and self._hookList():
+                self._loadAll()
+            elif not ks:
+                d = self.__dict__
+                d['_raw'].clear()
+                d['_pos'] = None
+                d['_order'].clear()
+                self._settle()
+            else:
+                k = self._first(ks, sep)
+                if not isinstance(ks, str) or ks == k:
+                    self._drop(k)
+                else:
+                    self._load(k)
+        return Bag.set(self, ks, val, sep)
+
+    def delete(self, ks, sep='.'):
+        if self.__dict__['_lazy']:
+            k = self._first(ks, sep)
+            if not isinstance(ks, str) or ks == k:
+                if k in self:
+                    self.__delitem__(k)
+                    return True
+                return False
+            self._load(k)
+        return Bag.delete(self, ks, sep)
+
+    def merge(self, pb, overwrite=True):
+        self._loadAll()
+        return Bag.merge(self, pb, overwrite)
+
+    def update(self, *args, **kwargs):
+        self._loadAll()
+        return Bag.update(self, *args, **kwargs)
+
+    def as_dict(self):
+        self._loadAll()
+        return Bag.as_dict(self)
+
+    def items(self):
+        self._loadAll()
+        return Bag.items(self)
+
+    def values(self):
+        self._loadAll()
+        return Bag.values(self)
+
+    ''' Returns the top level keys without decoding any values
+    '''
+    def keys(self):
+        d = self.__dict__
+        if not d['_lazy']:
+            return Bag.keys(self)
+        self._scan()
+        pb = d['pb']
+        raw = d['_raw']
+        order = d['_order']
+        r = [k for k in order if k in raw or k in pb]
+        r.extend(k for k in pb if k not in order)
+        return r
+
+    def copy(self):
+        self._loadAll()
+        return Bag.copy(self)
+
+    ''' Converts properties to a json string
+        @param [in] pretty      - Non-zero for a human friendly output
+        @param [in] indent      - If pretty is set, set the indent size
+        @param [in] sort_keys   - If pretty is set, sorts the keys when set
+
+        Unless pretty is set, values that were never decoded are copied
+        from the source string unchanged.
+    '''
+    def to_json(self, pretty=False, indent=2, sort_keys=True):
+        if pretty or not self.__dict__['_lazy']:
+            self._loadAll()
+            return Bag.to_json(self, pretty, indent, sort_keys)
+        dumps = json.dumps
+        keys = self.keys()
+        src = self.__dict__['_src']
+        raw = self.__dict__['_raw']
+        pb = self.__dict__['pb']
+        parts = []
+        for k in keys:
+            if k in raw:
+                a, b = raw[k]
+                parts.append(dumps(k) + ': ' + src[a:b])
+            else:
+                parts.append(dumps({k: pb[k]})[1:-1])
+        return '{' + ', '.join(parts) + '}'
+
+    toJson = to_json
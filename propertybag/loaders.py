@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import os
+import json
+import marshal
+import hashlib
+import datetime
+
+''' Config file loaders
+
+    load_file() reads json, toml, ini, env and yaml files into dicts, the
+    format comes from the file extension. Parsed results can be cached on
+    disk with marshal, keyed by the file path, modification time and size,
+    so loading an unchanged file again only unmarshals the result.
+
+    load_env() reads PREFIX__A__B=value environment variables as
+    {'a': {'b': 'value'}}, env files use the same layout.
+
+    The parser modules are imported by the parsers, so loading json does
+    not pay for importing yaml.
+
+    @begincode
+
+        cfg = pb.Bag.load_file('config.toml', cache=True)
+        cfg.merge(pb.Bag.load_env('MYAPP'))
+
+    @endcode
+'''
+
+FORMATS = ('json', 'toml', 'ini', 'env', 'yaml')
+
+EXTENSIONS = {
+    '.json': 'json',
+    '.toml': 'toml',
+    '.ini': 'ini',
+    '.cfg': 'ini',
+    '.conf': 'ini',
+    '.env': 'env',
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+}
+
+# Environment variable with the default cache directory
+CACHE_ENV = 'PROPERTYBAG_CACHE'
+
+# First item of the tuples standing for dates and times in cache files
+TAG = '\x00type'
+
+# Types written to cache files as tagged iso strings
+TAGGED = {
+    'datetime': datetime.datetime,
+    'date': datetime.date,
+    'time': datetime.time,
+}
+
+
+''' Returns the format of a file from its name, None if unknown
+    @param [in] path    - File name
+'''
+def detect(path):
+    name = os.path.basename(os.fspath(path)).lower()
+    ext = os.path.splitext(name)[1]
+    if not ext and name.startswith('.'):
+        ext = name
+    if ext in EXTENSIONS:
+        return EXTENSIONS[ext]
+    if name.startswith('.env'):
+        return 'env'
+    return None
+
+''' Returns a nested dict from (name, value) pairs
+    @param [in] items   - Iterable of (name, value)
+    @param [in] prefix  - Only names starting with prefix and sep are used,
+                          the prefix is removed, None to use all names
+    @param [in] sep     - Separator between levels in the names
+
+    Names are lower cased, the pairs are applied in sorted order so a
+    nested name replaces a value set at one of its parents.
+'''
+def envDict(items, prefix=None, sep='__'):
+    if prefix:
+        prefix += sep
+    r = {}
+    for k, v in sorted(items):
+        if prefix:
+            if not k.startswith(prefix):
+                continue
+            k = k[len(prefix):]
+        keys = [p for p in k.lower().split(sep) if p]
+        if not keys:
+            continue
+        d = r
+        for p in keys[:-1]:
+            n = d.get(p)
+            if not isinstance(n, dict):
+                n = d[p] = {}
+            d = n
+        d[keys[-1]] = v
+    return r
+
+def parseJson(data, prefix):
+    return json.loads(data)
+
+def parseToml(data, prefix):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ValueError('TOML needs python 3.11 or the tomli module')
+    return tomllib.loads(data.decode('utf-8'))
+
+def parseIni(data, prefix):
+    import configparser
+    cp = configparser.ConfigParser(interpolation=None)
+    cp.optionxform = str
+    try:
+        cp.read_string(data.decode('utf-8'))
+    except configparser.Error as e:
+        raise ValueError(str(e))
+    r = {}
+    if cp.defaults():
+        r[cp.default_section] = dict(cp.defaults())
+    for s in cp.sections():
+        r[s] = dict(cp.items(s))
+    return r
+
+def parseEnv(data, prefix):
+    items = []
+    for line in data.decode('utf-8').splitlines():
+        line = line.strip()
+        if not line or '#' == line[0]:
+            continue
+        if line.startswith('export '):
+            line = line[7:].lstrip()
+        k, eq, v = line.partition('=')
+        if not eq:
+            continue
+        v = v.strip()
+        if 2 <= len(v) and v[0] == v[-1] and v[0] in '"\'':
+            v = v[1:-1]
+        items.append((k.strip(), v))
+    return envDict(items, prefix)
+
+def parseYaml(data, prefix):
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError('YAML needs the yaml module')
+    try:
+        r = yaml.safe_load(data)
+    except yaml.YAMLError as e:
+        raise ValueError(str(e))
+    return {} if r is None else r
+
+PARSERS = {
+    'json': parseJson,
+    'toml': parseToml,
+    'ini': parseIni,
+    'env': parseEnv,
+    'yaml': parseYaml,
+}
+
+''' Returns the default cache directory
+'''
+def defaultCache():
+    d = os.environ.get(CACHE_ENV)
+    if d:
+        return d
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'propertybag')
+
+''' Returns the cache file for a config file
+    @param [in] cache   - Cache directory
+    @param [in] key     - Cache key, see load_file()
+
+    The name does not depend on the modification time or size, so a
+    changed file replaces its old cache entry.
+'''
+def cacheFile(cache, key):
+    h = hashlib.blake2b(repr((key[0],) + key[3:]).encode('utf-8'), digest_size=16)
+    return os.path.join(cache, h.hexdigest() + '.marshal')
+
+''' Returns a copy of the dicts and lists in v with f applied to the other values
+'''
+def convert(v, f):
+    if isinstance(v, dict):
+        return {k: convert(x, f) for k, x in v.items()}
+    if isinstance(v, list):
+        return [convert(x, f) for x in v]
+    return f(v)
+
+''' Returns a date or time as (TAG, type, iso string), other values as is
+'''
+def tag(v):
+    for t, c in TAGGED.items():
+        if type(v) is c:
+            return (TAG, t, v.isoformat())
+    return v
+
+''' Reverses tag()
+'''
+def untag(v):
+    if type(v) is tuple and 3 == len(v) and TAG == v[0]:
+        return TAGGED[v[1]].fromisoformat(v[2])
+    return v
+
+''' Returns (True, data) if the cache file holds data for key
+
+    marshal only reads data, so a cache directory others can write to
+    can change the values loaded but not run code. Dates and times are
+    stored with tag() and only looked for when the file has any.
+'''
+def readCache(fname, key):
+    try:
+        with open(fname, 'rb') as f:
+            k, tagged, data = marshal.loads(f.read())
+    except Exception:
+        return False, None
+    if k != key:
+        return False, None
+    if tagged:
+        try:
+            data = convert(data, untag)
+        except Exception:
+            return False, None
+    return True, data
+
+''' Writes a cache file, errors are ignored since the cache is optional
+
+    Data that does not read back equal is not cached.
+'''
+def writeCache(fname, key, data):
+    tmp = '%s.%d.tmp' % (fname, os.getpid())
+    try:
+        t = convert(data, tag)
+        tagged = t != data
+        b = marshal.dumps((key, tagged, t))
+        r = marshal.loads(b)[2]
+        if (convert(r, untag) if tagged else r) != data:
+            return
+        os.makedirs(os.path.dirname(fname), mode=0o700, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(b)
+        os.replace(tmp, fname)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+''' Loads a config file
+    @param [in] path    - File name
+    @param [in] fmt     - One of FORMATS, None to use the file extension
+    @param [in] cache   - Directory for the parsed result cache, True for
+                          $PROPERTYBAG_CACHE or ~/.cache/propertybag,
+                          False or None to always parse the file
+    @param [in] prefix  - For env files, only variables starting with
+                          prefix and '__' are loaded
+
+    A cached result is used if the file has the same path, modification
+    time and size as when it was cached.
+
+    @returns dict with the file contents
+'''
+def load_file(path, fmt=None, cache=False, prefix=None):
+    path = os.fspath(path)
+    if fmt is None:
+        fmt = detect(path)
+        if fmt is None:
+            raise ValueError('Unknown config format : %s' % path)
+    if fmt not in PARSERS:
+        raise ValueError('Invalid format : %s' % fmt)
+    with open(path, 'rb') as f:
+        if cache:
+            st = os.fstat(f.fileno())
+            key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, fmt, prefix)
+            cf = cacheFile(defaultCache() if cache is True else os.fspath(cache), key)
+            found, d = readCache(cf, key)
+            if found:
+                return d
+        data = f.read()
+    try:
+        d = PARSERS[fmt](data, prefix)
+    except ValueError as e:
+        raise ValueError('Invalid %s in %s : %s' % (fmt, path, e))
+    if not isinstance(d, dict):
+        raise ValueError('Not a mapping in %s' % path)
+    if cache:
+        writeCache(cf, key, d)
+    return d
+
+''' Alias for load_file()
+'''
+loadFile = load_file
+
+''' Loads environment variables
+    @param [in] prefix  - Only variables starting with prefix and sep are
+                          loaded, None for all of them
+    @param [in] environ - Mapping to read instead of os.environ
+    @param [in] sep     - Separator between levels in the names
+
+    @returns dict, MYAPP__DB__HOST=x with prefix 'MYAPP' is {'db': {'host': 'x'}}
+'''
+def load_env(prefix, environ=None, sep='__'):
+    return envDict((os.environ if environ is None else environ).items(), prefix, sep)
+
+''' Alias for load_env()
+'''
+loadEnv = load_env
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import os
+import json
+import time
+import zlib
+import threading
+
+from . propertybag import Bag
+
+''' Journaled persistence
+
+    A PersistentBag keeps its contents in a json snapshot file plus an
+    append-only journal next to it. Every change made through the Bag
+    API is appended to the journal before it is applied, so a change
+    costs one short write instead of rewriting the whole file.
+
+    Files used for a PersistentBag at 'state.json'
+
+        state.json              - Snapshot
+        state.json.journal      - Changes since the snapshot
+        state.json.journal.old  - Journal being folded into the snapshot
+
+    Each journal line is a crc32 followed by a json list, ["s", path, value]
+    for a set, ["d", path] for a delete and ["r", value] for replacing the
+    whole contents. On startup the snapshot is loaded and the journals are
+    replayed up to the first incomplete or damaged line, which is where the
+    journal is cut off.
+
+    Once the journal grows past compact_size it is renamed to .old and a
+    new one is started. A background thread then replays the .old journal
+    onto the snapshot read from disk, so the live Bag is never copied or
+    locked. Replaying a journal twice gives the same result, so a crash at
+    any point of the compaction is recovered by replaying both journals.
+
+    @begincode
+
+        with pb.PersistentBag('state.json') as state:
+            state.counters.hits = 1
+            state.set('users.alice.seen', time.time())
+
+    @endcode
+'''
+
+# fsync policies
+SYNC = ('always', 'interval', 'never')
+
+
+#--------------------------------------------------------------------------------------------------
+# File helpers
+
+''' Returns a key as the string json uses for it in an object
+'''
+def jsonKey(k):
+    if isinstance(k, str):
+        return k
+    if k is None or isinstance(k, (int, float)):
+        return json.dumps(k)
+    raise ValueError('Invalid key type for json : %r' % (k,))
+
+''' Returns a journal line for a change
+    @param [in] op      - Hook operation, see Bag._notify()
+    @param [in] path    - Key path of the change
+    @param [in] v       - New value
+
+    Keys are written as json object keys, so the journal and the snapshot
+    agree on them. Replacing the contents of a nested bag is written as a
+    set of its path.
+'''
+def encodeOp(op, path, v):
+    if isinstance(v, Bag):
+        v = v.as_dict()
+    for k in path:
+        if type(k) is not str:
+            path = [jsonKey(k) for k in path]
+            break
+    if 'del' == op:
+        r = ['d', path]
+    elif 'replace' == op and not path:
+        r = ['r', v]
+    else:
+        r = ['s', path, v]
+    b = json.dumps(r, separators=(',', ':')).encode('utf-8')
+    return b'%08x ' % zlib.crc32(b) + b + b'\n'
+
+''' Reads the valid part of a journal
+    @param [in] fname   - Journal file name
+
+    @returns Tuple (ops, good, size) with the decoded operations, the number
+             of bytes up to the first bad line and the file size
+'''
+def readJournal(fname):
+    ops = []
+    good = 0
+    try:
+        f = open(fname, 'rb')
+    except FileNotFoundError:
+        return ops, 0, 0
+    with f:
+        for line in f:
+            if 10 > len(line) or b'\n' != line[-1:] or b' ' != line[8:9]:
+                break
+            b = line[9:-1]
+            try:
+                if int(line[:8], 16) != zlib.crc32(b):
+                    break
+                ops.append(json.loads(b))
+            except ValueError:
+                break
+            good += len(line)
+        size = f.seek(0, os.SEEK_END)
+    return ops, good, size
+
+''' Applies journal operations to a dict
+    @param [in] root    - dict to change
+    @param [in] ops     - Operations from readJournal()
+
+    @returns The changed dict, which is a new one if the contents were replaced
+'''
+def replay(root, ops):
+    for o in ops:
+        c = o[0]
+        if 'r' == c:
+            root = o[1] if isinstance(o[1], dict) else dict()
+            continue
+        path = o[1]
+        d = root
+        for k in path[:-1]:
+            n = d.get(k)
+            if not isinstance(n, dict):
+                if 'd' == c:
+                    d = None
+                    break
+                n = d[k] = dict()
+            d = n
+        if 'd' == c:
+            if d is not None:
+                d.pop(path[-1], None)
+        else:
+            d[path[-1]] = o[2]
+    return root
+
+''' Reads a snapshot, returns an empty dict if there is none
+'''
+def readSnapshot(fname):
+    try:
+        with open(fname, 'r') as f:
+            r = json.load(f)
+    except FileNotFoundError:
+        return dict()
+    if not isinstance(r, dict):
+        raise ValueError('Snapshot is not a json object : %s' % fname)
+    return r
+
+''' Atomically replaces a snapshot
+'''
+def writeSnapshot(fname, data):
+    tmp = fname + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, fname)
+    syncDir(fname)
+
+''' Flushes the directory entry of a file, where the platform allows it
+'''
+def syncDir(fname):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(fname)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+#==================================================================================================
+''' class Journal
+
+    Journal file of a PersistentBag, installed as its write hook.
+'''
+class Journal():
+
+    ''' Constructor, see PersistentBag for the parameters
+    '''
+    def __init__(self, path, batch, sync, interval, compact_size, background):
+        if sync not in SYNC:
+            raise ValueError('Invalid sync policy : %s' % sync)
+        self.path = path
+        self.jname = path + '.journal'
+        self.oname = path + '.journal.old'
+        self.batch = max(1, int(batch))
+        self.sync = sync
+        self.interval = interval
+        self.compact_size = compact_size
+        self.background = background
+        self.buf = []
+        self.f = None
+        self.size = 0
+        self.synced = time.monotonic()
+        self.worker = None
+        self.error = None
+
+    ''' Loads the snapshot and replays the journals
+
+        @returns dict with the recovered contents
+    '''
+    def load(self):
+        data = readSnapshot(self.path)
+        old = os.path.exists(self.oname)
+        if old:
+            data = replay(data, readJournal(self.oname)[0])
+        ops, good, size = readJournal(self.jname)
+        data = replay(data, ops)
+        if good < size:
+            with open(self.jname, 'r+b') as f:
+                f.truncate(good)
+                os.fsync(f.fileno())
+        if old:
+            # Finish the compaction that was interrupted
+            writeSnapshot(self.path, data)
+            os.remove(self.oname)
+            good = 0
+            open(self.jname, 'wb').close()
+            syncDir(self.jname)
+        self.f = open(self.jname, 'ab')
+        self.size = good
+        return data
+
+    ''' Write hook, appends a change to the journal
+    '''
+    def record(self, op, path, d, k, v):
+        if self.f is None:
+            raise ValueError('PersistentBag is closed : %s' % self.path)
+        self.buf.append(encodeOp(op, path, v))
+        if len(self.buf) >= self.batch:
+            self.flush()
+
+    ''' Writes buffered changes to the journal file
+        @param [in] fsync   - True to fsync regardless of the sync policy
+    '''
+    def write(self, fsync=False):
+        if self.buf:
+            b = b''.join(self.buf)
+            self.buf = []
+            self.f.write(b)
+            self.f.flush()
+            self.size += len(b)
+        if 'never' == self.sync and not fsync:
+            return
+        now = time.monotonic()
+        if fsync or 'always' == self.sync or now - self.synced >= self.interval:
+            os.fsync(self.f.fileno())
+            self.synced = now
+
+    ''' Writes buffered changes and starts a compaction if the journal is too big
+    '''
+    def flush(self):
+        self.write()
+        if self.compact_size and self.size >= self.compact_size and not self.busy():
+            self.compact(not self.background)
+
+    ''' Returns True while a background compaction is running
+    '''
+    def busy(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    ''' Starts a new journal and folds the current one into the snapshot
+        @param [in] wait    - True to compact in this thread, False to use a background thread
+    '''
+    def compact(self, wait=True):
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+        if os.path.exists(self.oname):
+            # A previous compaction failed, it has to finish first
+            self.fold()
+            if os.path.exists(self.oname):
+                raise ValueError('Compaction failed : %s' % self.error)
+        self.write(True)
+        self.f.close()
+        os.replace(self.jname, self.oname)
+        self.f = open(self.jname, 'ab')
+        self.size = 0
+        syncDir(self.jname)
+        if wait:
+            self.fold()
+        else:
+            self.worker = threading.Thread(target=self.fold, name='propertybag-compact', daemon=True)
+            self.worker.start()
+
+    ''' Replays the .old journal onto the snapshot file and removes it
+
+        Only works on the files, so it is safe to run in another thread.
+    '''
+    def fold(self):
+        try:
+            data = replay(readSnapshot(self.path), readJournal(self.oname)[0])
+            writeSnapshot(self.path, data)
+            os.remove(self.oname)
+            self.error = None
+        except Exception as e:
+            self.error = e
+
+    ''' Writes buffered changes, waits for compaction and closes the journal
+    '''
+    def close(self):
+        if self.f is None:
+            return
+        self.write('never' != self.sync)
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+        self.f.close()
+        self.f = None
+        if self.error is not None:
+            raise ValueError('Compaction failed : %s' % self.error)
+
+
+#==================================================================================================
+''' class PersistentBag
+
+    Bag that is stored in a json snapshot plus a write-ahead journal.
+
+    Changes made through set(), delete(), merge(), update(), attribute or
+    item writes and nested bags are journaled. Changes made directly to
+    dicts returned by as_dict() or get() bypass the journal.
+
+    @begincode
+
+        state = pb.PersistentBag('state.json', batch=100, sync='interval')
+        state.jobs.last = 42
+        state.close()
+
+    @endcode
+'''
+class PersistentBag(Bag):
+
+    ''' Constructor
+        @param [in] path            - Snapshot file name
+        @param [in] batch           - Number of changes buffered before they are
+                                      written, changes still in the buffer are
+                                      lost on a crash
+        @param [in] sync            - fsync policy, 'always' after every write,
+                                      'interval' at most every interval seconds
+                                      or 'never' to leave it to the OS
+        @param [in] interval        - Seconds between fsyncs for 'interval'
+        @param [in] compact_size    - Journal size in bytes that triggers a
+                                      compaction, 0 to never compact automatically
+        @param [in] background      - True to compact in a background thread
+        @param [in] defstr          - Default string value when non exists
+        @param [in] defval          - Default value when non exists
+    '''
+    def __init__(self, path, batch=1, sync='interval', interval=1.0, compact_size=16 * 1024 * 1024,
+                 background=True, _defstr=ValueError, _defval=None):
+        j = Journal(path, batch, sync, interval, compact_size, background)
+        Bag.__init__(self, j.load(), _defstr, _defval)
+        self.__dict__['_journal'] = j
+        self.add_hook(j.record)
+
+    ''' Writes buffered changes to the journal
+        @param [in] fsync   - True to also fsync the journal
+    '''
+    def flush(self, fsync=False):
+        self.__dict__['_journal'].write(fsync)
+
+    ''' Writes a fresh snapshot and starts an empty journal
+        @param [in] wait    - False to write the snapshot in a background thread
+    '''
+    def compact(self, wait=True):
+        self.__dict__['_journal'].compact(wait)
+
+    ''' Flushes and closes the journal, further changes raise ValueError
+    '''
+    def close(self):
+        self.__dict__['_journal'].close()
+
+    ''' Returns the current journal size in bytes
+    '''
+    def journal_size(self):
+        j = self.__dict__['_journal']
+        return j.size + sum(len(b) for b in j.buf)
+
+    ''' Alias for journal_size()
+    '''
+    journalSize = journal_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, t, e, tb):
+        self.close()
+        return False
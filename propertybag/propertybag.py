@@ -4,6 +4,20 @@ from __future__ import print_function
 
 import json
 
+_MISS = object()
+
+# propertybag.intern.loads(), set by _internLoads()
+_loads = None
+
+''' Returns propertybag.intern.loads(), importing it on the first call
+'''
+def _internLoads():
+    global _loads
+    if _loads is None:
+        from . intern import loads
+        _loads = loads
+    return _loads
+
 
 #==================================================================================================
 ''' class PlaceHolder
@@ -15,10 +29,16 @@ import json
 class PlaceHolder():
 
     ''' Constructor
+        @param [in] pb      - dict the missing key belongs to
+        @param [in] k       - Missing key
+        @param [in] defstr  - Default string value
+        @param [in] defval  - Default value
+        @param [in] bag     - Bag wrapping pb, writes are reported to its hooks
     '''
-    def __init__(self, pb, k, defstr, defval):
+    def __init__(self, pb, k, defstr, defval, bag=None):
         self.__dict__['pb'] = pb
         self.__dict__['k'] = [k]
+        self.__dict__['_bag'] = bag
 
         self.__dict__['defval'] = defval
         try:
@@ -52,9 +72,22 @@ class PlaceHolder():
     '''
     def __setattr__(self, k, v):
         pb = self.__dict__['pb']
+        bag = self.__dict__['_bag']
+        h = bag._hookList() if bag is not None else None
+        if not h:
+            for i in self.__dict__['k']:
+                pb[i] = dict()
+                pb = pb[i]
+            pb[k] = v
+            return
+        keys = ()
         for i in self.__dict__['k']:
-            pb[i] = dict()
+            keys += (i,)
+            d = dict()
+            bag._notify(h, 'make', keys, pb, i, d)
+            pb[i] = d
             pb = pb[i]
+        bag._notify(h, 'set', keys + (k,), pb, k, v)
         pb[k] = v
 
     ''' Throws an error, trying to delete a non-existent key
@@ -143,21 +176,30 @@ class PlaceHolder():
 '''
 class Bag(dict):
 
+    # Class of the bags returned for nested dicts, set to Bag below
+    _View = None
+
     ''' Constructor
         @param [in] i           - dict to initialize object with
         @param [in] defstr      - Default string value when non exists
         @param [in] defval      - Default value when non exists
+        @param [in] intern      - Interning for json strings, an InternTable, True
+                                  for the shared table, False for none or None
+                                  for the default, see propertybag.intern
 
         If default values are not provided, an exception willl be thrown instead.
     '''
     # def __init__(self, *args, _defstr=ValueError, _defval=None, **kwargs):
-    def __init__(self, _i=None, _defstr=ValueError, _defval=None, **kwargs):
+    def __init__(self, _i=None, _defstr=ValueError, _defval=None, _intern=None, **kwargs):
 
         dict.__init__(self, _='_')
 
         self.__dict__['defstr'] = _defstr
         self.__dict__['defval'] = _defval
         self.__dict__['pb'] = dict()
+        self.__dict__['_root'] = None
+        self.__dict__['_path'] = ()
+        self.__dict__['_hooks'] = []
 
         # i = 0
         # while True:
@@ -185,7 +227,7 @@ class Bag(dict):
         elif isinstance(_i, Bag):
             self.__dict__['pb'] = _i.__dict__['pb']
         elif isinstance(_i, str):
-            self.__dict__['pb'] = json.loads(_i)
+            self.__dict__['pb'] = (_loads or _internLoads())(_i, _intern)
         else:
             self.__dict__['pb'] = dict()
 
@@ -213,14 +255,300 @@ class Bag(dict):
                 i -= 1
         return d
 
+    ''' Returns a Bag wrapping a nested dict
+        @param [in] keys    - Key path of v relative to this bag
+        @param [in] v       - Nested dict
+
+        The returned bag is a _View and shares the write hooks of this bag.
+    '''
+    def _sub(self, keys, v):
+        b = dict.__new__(self._View)
+        dict.__init__(b, _='_')
+        d = self.__dict__
+        bd = b.__dict__
+        bd['defstr'] = ValueError
+        bd['defval'] = None
+        bd['pb'] = v
+        bd['_root'] = self if d['_root'] is None else d['_root']
+        bd['_path'] = d['_path'] + keys
+        bd['_hooks'] = d['_hooks']
+        return b
+
+    ''' Returns the root of the bag tree
+    '''
+    def _rootBag(self):
+        r = self.__dict__['_root']
+        return self if r is None else r
+
+    ''' Returns the list of write hooks, shared by the whole tree
+    '''
+    def _hookList(self):
+        return self.__dict__['_hooks']
+
+    ''' Calls the write hooks before a change
+        @param [in] h       - List of hooks from _hookList()
+        @param [in] op      - 'set', 'make' (created intermediate dict),
+                              'del' or 'replace' (whole bag contents)
+        @param [in] keys    - Key path of the change relative to this bag
+        @param [in] d       - dict being changed, or the Bag for 'replace'
+        @param [in] k       - Key being changed, None for 'replace'
+        @param [in] v       - New value
+    '''
+    def _notify(self, h, op, keys, d, k, v=None):
+        path = self.__dict__['_path'] + keys
+        for f in tuple(h):
+            f(op, path, d, k, v)
+
+    ''' Adds a write hook
+        @param [in] f   - Called as f(op, path, d, k, v) before every change made
+                          through this bag or bags returned from it, see _notify()
+
+        The hook list is shared with the root and all nested bags, so adding
+        one through a nested bag observes the whole tree.
+    '''
+    def add_hook(self, f):
+        self.__dict__['_hooks'].append(f)
+
+    ''' Removes a write hook
+        @param [in] f   - Hook passed to add_hook()
+    '''
+    def remove_hook(self, f):
+        h = self.__dict__['_hooks']
+        if f in h:
+            h.remove(f)
+
+    ''' Starts a transaction
+
+        @returns Transaction that can be committed or rolled back,
+                 and used as a context manager
+
+        Example:
+        @begincode
+
+            with pb.transaction():
+                pb.set("path.to.value", 42)
+                validate(pb)                # Exception undoes the set()
+
+        @endcode
+    '''
+    def transaction(self):
+        from . transaction import Transaction
+        return Transaction(self)
+
+    ''' Starts a nested transaction
+
+        Same as transaction(), rolling back a savepoint only undoes the
+        changes made since the savepoint.
+    '''
+    savepoint = transaction
+
+    ''' Returns the root bag and its fingerprint trie, enabling fingerprints
+    '''
+    def _fpRoot(self):
+        from . import fingerprint as _fingerprint
+        root = self._rootBag()
+        rd = root.__dict__
+        n = rd.get('_fp')
+        if n is None:
+            n = rd['_fp'] = _fingerprint.node()
+            root.add_hook(root._fpHook)
+        return root, n
+
+    ''' Write hook, clears the cached fingerprints along a changed path
+    '''
+    def _fpHook(self, op, path, d, k, v):
+        from . import fingerprint as _fingerprint
+        n = self.__dict__.get('_fp')
+        if n is None:
+            return
+        if 'replace' == op:
+            n[0] = None
+            n[1].clear()
+        else:
+            _fingerprint.invalidate(n, path)
+
+    ''' Returns the dict and fingerprint trie node of this bag
+    '''
+    def _fpNode(self):
+        from . import fingerprint as _fingerprint
+        root, n = self._fpRoot()
+        found, d, dn = _fingerprint.lookup(root.as_dict(), n, self.__dict__['_path'])
+        if dn is None:
+            return self.as_dict(), _fingerprint.node()
+        return d, dn
+
+    ''' Returns a content hash of the bag or of the value at a key
+        @param [in] ks      - Compound key, None for the whole bag
+        @param [in] sep     - Key separator
+
+        The first call enables fingerprints for the whole tree. They are
+        cached per nested dict and cleared along the key path of every
+        change made through the Bag API, so only changed subtrees are
+        hashed again.
+
+        Changes made directly to dicts returned by as_dict() or get()
+        are not seen, call clear_fingerprints() after making them.
+
+        @returns Hex string, or None if the key does not exist
+
+        Example:
+        @begincode
+
+            if old.fingerprint('services') != new.fingerprint('services'):
+                print(old.diff(new))
+
+        @endcode
+    '''
+    def fingerprint(self, ks=None, sep='.'):
+        from . import fingerprint as _fingerprint
+        root, n = self._fpRoot()
+        keys = self.__dict__['_path']
+        if isinstance(ks, str):
+            if ks:
+                keys += tuple(ks.split(sep))
+        elif ks is not None:
+            keys += (ks,)
+        found, v, vn = _fingerprint.lookup(root.as_dict(), n, keys)
+        if not found:
+            return None
+        return _fingerprint.fingerprint(v, vn)
+
+    ''' Returns the compound keys at which this bag and another differ
+        @param [in] other   - Bag or dict to compare with
+        @param [in] sep     - Key separator
+
+        Enables fingerprints on both bags, subtrees with equal fingerprints
+        are skipped.
+
+        @returns List of compound keys, including keys present on one side only
+    '''
+    def diff(self, other, sep='.'):
+        from . import fingerprint as _fingerprint
+        a, na = self._fpNode()
+        if isinstance(other, Bag):
+            b, nb = other._fpNode()
+        elif isinstance(other, dict):
+            b, nb = other, _fingerprint.node()
+        else:
+            raise ValueError('Can not compare with : %s' % type(other).__name__)
+        return [sep.join(k if isinstance(k, str) else str(k) for k in p)
+                for p in _fingerprint.diff(a, na, b, nb)]
+
+    ''' Returns True if this bag and another have the same fingerprint
+        @param [in] other   - Bag or dict to compare with
+
+        Enables fingerprints on both bags, so comparing again after a few
+        changes only hashes the changed subtrees. Each bag only sees the
+        changes made through its own tree, a nested dict shared with
+        another bag and changed through that one is not seen, == always
+        compares the contents.
+    '''
+    def same_fingerprint(self, other):
+        if isinstance(other, Bag):
+            return self.fingerprint() == other.fingerprint()
+        if isinstance(other, dict):
+            from . import fingerprint as _fingerprint
+            return self.fingerprint() == _fingerprint.fingerprint(other)
+        raise ValueError('Can not compare with : %s' % type(other).__name__)
+
+    ''' Alias for same_fingerprint()
+    '''
+    sameFingerprint = same_fingerprint
+
+    ''' Disables fingerprints and drops the cached ones
+    '''
+    def clear_fingerprints(self):
+        root = self._rootBag()
+        if root.__dict__.pop('_fp', None) is not None:
+            root.remove_hook(root._fpHook)
+
+    ''' Alias for clear_fingerprints()
+    '''
+    clearFingerprints = clear_fingerprints
+
+    ''' Adds a computed property
+        @param [in] ks      - Compound key of the property
+        @param [in] fn      - Function called with this bag, returns the value
+        @param [in] sep     - Key separator
+
+        The value is computed on the first read and stored at the key, so
+        later reads cost the same as for any other value. The key paths fn
+        reads through get(), bag(), exists() or attribute and index access
+        are recorded, and changing one of them through the Bag API removes
+        the stored value, which is computed again on the next read.
+        Computed properties can read other computed properties.
+
+        Setting the key replaces the value until one of the key paths fn
+        read changes, deleting it computes the value again on the next read.
+
+        Example:
+        @begincode
+
+            pb.compute('db.url', lambda b: '%s:%d' % (b.db.host, b.db.port))
+            pb.db.url                       # Computed
+            pb.db.port = 5433
+            pb.db.url                       # Computed again
+
+        @endcode
+    '''
+    def compute(self, ks, fn, sep='.'):
+        from . computed import Computed
+        root = self._rootBag()
+        c = root.__dict__.get('_computed')
+        if c is None:
+            c = root.__dict__['_computed'] = Computed(root)
+            root.add_hook(c.record)
+        keys = tuple(ks.split(sep)) if isinstance(ks, str) else (ks,)
+        c.add(self.__dict__['_path'], keys, fn)
+
+    ''' Removes a computed property and its stored value
+        @param [in] ks      - Compound key of the property
+        @param [in] sep     - Key separator
+
+        @returns True if there was a computed property at the key
+    '''
+    def uncompute(self, ks, sep='.'):
+        c = self._rootBag().__dict__.get('_computed')
+        if c is None:
+            return False
+        keys = tuple(ks.split(sep)) if isinstance(ks, str) else (ks,)
+        return c.remove(self.__dict__['_path'] + keys)
+
+    ''' Returns the computed value at a key that was not found
+        @param [in] ks      - Compound key relative to this bag
+        @param [in] defval  - Returned if there is no computed value
+        @param [in] sep     - Key separator, None if ks is a single key
+    '''
+    def _derive(self, ks, defval, sep=None):
+        d = self.__dict__
+        r = d['_root']
+        c = (d if r is None else r.__dict__).get('_computed')
+        if c is None:
+            return defval
+        keys = tuple(ks.split(sep)) if sep is not None and isinstance(ks, str) else (ks,)
+        return c.missing(d['_path'] + keys, defval)
+
+    ''' Computes the computed properties without a stored value
+
+        Computed properties install a write hook, callers skip this for
+        bags without hooks.
+    '''
+    def _fresh(self):
+        c = self._rootBag().__dict__.get('_computed')
+        if c is not None and c.dirty:
+            c.refresh()
+
     ''' Index operator
         @param [in] k   - Key to return
     '''
     def __getitem__(self, k):
         if k not in self.pb:
-            return PlaceHolder(self.pb, k, self.__dict__['defstr'], self.__dict__['defval'])
+            r = self._derive(k, _MISS) if self.__dict__['_hooks'] else _MISS
+            if r is _MISS:
+                return PlaceHolder(self.pb, k, self.__dict__['defstr'], self.__dict__['defval'], self)
+            return self._sub((k,), r) if isinstance(r, dict) else r
         if isinstance(self.pb[k], dict):
-            return Bag(self.pb[k])
+            return self._sub((k,), self.pb[k])
         return self.pb[k]
         # return self.pb[k]
 
@@ -229,12 +557,18 @@ class Bag(dict):
         @param [in] v   - New value to set
     '''
     def __setitem__(self, k, v):
-        self.pb[k] = v
+        d = self.__dict__
+        if d['_hooks']:
+            self._notify(d['_hooks'], 'set', (k,), d['pb'], k, v)
+        d['pb'][k] = v
 
     ''' Delete item operator
         @param [in] k   - Key of item to be deleted
     '''
     def __delitem__(self, k):
+        h = self._hookList()
+        if h and k in self.pb:
+            self._notify(h, 'del', (k,), self.pb, k)
         del self.pb[k]
 
     ''' Get attribute operator
@@ -242,9 +576,12 @@ class Bag(dict):
     '''
     def __getattr__(self, k):
         if k not in self.pb:
-            return PlaceHolder(self.pb, k, self.__dict__['defstr'], self.__dict__['defval'])
+            r = self._derive(k, _MISS) if self.__dict__['_hooks'] else _MISS
+            if r is _MISS:
+                return PlaceHolder(self.pb, k, self.__dict__['defstr'], self.__dict__['defval'], self)
+            return self._sub((k,), r) if isinstance(r, dict) else r
         if isinstance(self.pb[k], dict):
-            return Bag(self.pb[k])
+            return self._sub((k,), self.pb[k])
         return self.pb[k]
 
     ''' Set attribute operator
@@ -252,23 +589,35 @@ class Bag(dict):
         @param [in] v   - Attribute value to set
     '''
     def __setattr__(self, k, v):
-        self.__dict__['pb'][k] = v
+        d = self.__dict__
+        if d['_hooks']:
+            self._notify(d['_hooks'], 'set', (k,), d['pb'], k, v)
+        d['pb'][k] = v
 
     ''' Delete item operator
         @param [in] k   - Key of item to be deleted
     '''
     def __delattr__(self, k):
+        h = self._hookList()
+        if h and k in self.pb:
+            self._notify(h, 'del', (k,), self.pb, k)
         del self.pb[k]
 
     ''' Contains operator
         @param [in] k   - Key to check
     '''
     def __contains__(self, k):
-        return k in self.__dict__['pb']
+        if k in self.pb:
+            return True
+        if self._hooks:
+            return self._derive(k, _MISS) is not _MISS
+        return False
 
     ''' Length operator
     '''
     def __len__(self):
+        if self._hooks:
+            self._fresh()
         return len(self.pb)
 
     ''' String cast
@@ -279,36 +628,58 @@ class Bag(dict):
     ''' Object declaration cast
     '''
     def __repr__(self):
+        if self._hooks:
+            self._fresh()
         items = (f"{k}={v!r}" for k, v in self.pb.items())
         return "{}({})".format(type(self).__name__, ", ".join(items))
 
     ''' Key iterator
     '''
     def __iter__(self):
+        if self._hooks:
+            self._fresh()
         for k in self.pb:
             yield k
 
     ''' Equality operator
     '''
     def __eq__(self, other):
+        if self._hooks:
+            self._fresh()
         if isinstance(other, Bag):
-            return self.pb == other.pb
-        elif isinstance(other, dict):
+            if other._hooks:
+                other._fresh()
+            other = other.pb
+        elif not isinstance(other, dict):
+            return NotImplemented
+        try:
             return self.pb == other
-        return NotImplemented
+        except RecursionError:
+            from . import tree
+            return tree.equal(self.pb, other)
 
     ''' Equality operator
     '''
     def __ne__(self, other):
+        if self._hooks:
+            self._fresh()
         if isinstance(other, Bag):
-            return self.pb != other.pb
-        elif isinstance(other, dict):
+            if other._hooks:
+                other._fresh()
+            other = other.pb
+        elif not isinstance(other, dict):
+            return NotImplemented
+        try:
             return self.pb != other
-        return NotImplemented
+        except RecursionError:
+            from . import tree
+            return not tree.equal(self.pb, other)
 
     ''' Return object as dict
     '''
     def as_dict(self):
+        if self._hooks:
+            self._fresh()
         return self.pb
 
     ''' Get value using compound key
@@ -333,17 +704,24 @@ class Bag(dict):
         r = self.pb
         try:
             if not isinstance(ks, str):
-                return r[ks] if ks in r else defval
-            if not ks:
+                if ks in r:
+                    return r[ks]
+                sep = None
+            elif not ks:
+                return r
+            else:
+                for k in ks.split(sep):
+                    if not isinstance(r, dict) and not isinstance(r, Bag):
+                        raise KeyError(k)
+                    d += 1
+                    r = r[k]
                 return r
-            for k in ks.split(sep):
-                if not isinstance(r, dict) and not isinstance(r, Bag):
-                    return defval
-                d += 1
-                r = r[k]
         except Exception as e:
-            return defval
-        return r if 0 < d else defval
+            pass
+        # Computed properties are only set up with a write hook
+        if self.__dict__['_hooks']:
+            return self._derive(ks, defval, sep)
+        return defval
 
     ''' Return True if key exists, else False
         @param [in] ks      - Compound key
@@ -370,11 +748,11 @@ class Bag(dict):
                 return r
             for k in ks.split(sep):
                 if not isinstance(r, dict) and not isinstance(r, Bag):
-                    return False
+                    return bool(self.__dict__['_hooks']) and self._derive(ks, _MISS, sep) is not _MISS
                 d += 1
                 r = r[k]
         except Exception as e:
-            return False
+            return bool(self.__dict__['_hooks']) and self._derive(ks, _MISS, sep) is not _MISS
         if 0 >= d:
             return False
         return True
@@ -400,6 +778,9 @@ class Bag(dict):
         try:
             if not isinstance(ks, str):
                 if ks in a:
+                    h = self._hookList()
+                    if h:
+                        self._notify(h, 'del', (ks,), a, ks)
                     del a[ks]
                     return True
             if not ks:
@@ -415,6 +796,11 @@ class Bag(dict):
             return False
         if 0 >= d:
             return False
+        if r not in a:
+            return False
+        h = self._hookList()
+        if h:
+            self._notify(h, 'del', tuple(ks.split(sep)), a, r)
         del a[r]
         return True
 
@@ -431,19 +817,41 @@ class Bag(dict):
             pb.set("path/to/value", 42, "/")
 
         @endcode
+
+        An empty key with a dict replaces the contents of the bag, on a
+        nested bag this sets its value in the parent.
     '''
     def set(self, ks, val, sep='.'):
+        h = self.__dict__['_hooks']
         if not ks:
+            if isinstance(val, Bag):
+                val = val.pb
             if isinstance(val, dict):
+                path = self.__dict__['_path']
+                if not path:
+                    if h:
+                        self._notify(h, 'replace', (), self, None, val)
+                else:
+                    # A nested bag replaces its value in the parent
+                    d = self._rootBag().__dict__['pb']
+                    for k in path[:-1]:
+                        d = d.get(k) if isinstance(d, dict) else None
+                    k = path[-1]
+                    if isinstance(d, dict) and d.get(k) is self.__dict__['pb']:
+                        if h:
+                            self._notify(h, 'set', (), d, k, val)
+                        d[k] = val
                 self.__dict__['pb'] = val
-            elif isinstance(val, Bag):
-                self.__dict__['pb'] = val.pb
             return self.pb
         kn = None
         r = self.pb
         if not isinstance(ks, str):
+            if h:
+                self._notify(h, 'set', (ks,), r, ks, val)
             r[ks] = val
             return r[ks]
+        if h:
+            return self._setHooked(h, ks, val, sep)
         for k in str(ks).split(sep):
             if kn:
                 if kn not in r:
@@ -457,6 +865,28 @@ class Bag(dict):
             return r[kn]
         return None
 
+    ''' Same as set(), reporting each change to the write hooks
+        @param [in] h       - List of hooks from _hookList()
+    '''
+    def _setHooked(self, h, ks, val, sep):
+        kn = None
+        r = self.pb
+        keys = ()
+        for k in str(ks).split(sep):
+            if kn:
+                if kn not in r or not isinstance(r[kn], dict):
+                    d = dict()
+                    self._notify(h, 'make', keys, r, kn, d)
+                    r[kn] = d
+                r = r[kn]
+            kn = k
+            keys += (k,)
+        if kn:
+            self._notify(h, 'set', keys, r, kn, val)
+            r[kn] = val
+            return r[kn]
+        return None
+
     ''' Get propertybag using compound key
         @param [in] ks      - Compound key
         @param [in] defval  - Default value
@@ -482,32 +912,49 @@ class Bag(dict):
         try:
             if not isinstance(ks, str):
                 if ks not in r:
-                    return defval
+                    r = self._derive(ks, _MISS) if self.__dict__['_hooks'] else _MISS
+                    if r is _MISS:
+                        return defval
+                else:
+                    r = r[ks]
                 d += 1
-                r = r[ks]
             elif not ks:
                 return r
             else:
                 for k in ks.split(sep):
                     if not isinstance(r, dict) and not isinstance(r, Bag):
-                        return defval
+                        raise KeyError(k)
                     d += 1
                     r = r[k]
         except Exception as e:
-            return defval
+            r = self._derive(ks, _MISS, sep) if self.__dict__['_hooks'] else _MISS
+            if r is _MISS:
+                return defval
         if 0 >= d:
             return defval
         if isinstance(r, dict):
-            return Bag(r)
+            return self._sub(tuple(ks.split(sep)) if isinstance(ks, str) else (ks,), r)
         return r
 
     ''' Merge the values from the specified property bag or array
+        @param [in] pb          - dict or Bag to merge
+        @param [in] overwrite   - If False, existing keys are kept
     '''
     def merge(self, pb, overwrite=True):
-        if isinstance(pb, dict):
-            self.__dict__['pb'] = {**self.pb, **pb} if overwrite else {**pb, **self.pb}
-        elif isinstance(pb, Bag):
-            self.__dict__['pb'] = {**self.pb, **pb.pb} if overwrite else {**pb.pb, **self.pb}
+        if isinstance(pb, Bag):
+            pb = pb.pb
+        elif not isinstance(pb, dict):
+            return
+        d = self.pb
+        h = self._hookList()
+        if not h and overwrite:
+            d.update(pb)
+            return
+        for k, v in pb.items():
+            if overwrite or k not in d:
+                if h:
+                    self._notify(h, 'set', (k,), d, k, v)
+                d[k] = v
 
     ''' Update property bag values
     '''
@@ -518,40 +965,121 @@ class Bag(dict):
             i += 1
             if not a:
                 break
-            if isinstance(a, dict):
-                self.__dict__['pb'].update(a)
-            elif isinstance(pb, Bag):
-                self.__dict__['pb'].update(a.pb)
+            if isinstance(a, Bag):
+                a = a.pb
+            self.merge(a)
         if len(kwargs):
-            self.__dict__['pb'].update(kwargs)
+            self.merge(kwargs)
 
 
     ''' Returns the dict items
     '''
     def items(self):
+        if self._hooks:
+            self._fresh()
         return self.pb.items()
 
     ''' Returns the dict keys
     '''
     def keys(self):
+        if self._hooks:
+            self._fresh()
         return self.pb.keys()
 
     ''' Returns the dict values
     '''
     def values(self):
+        if self._hooks:
+            self._fresh()
         return self.pb.values()
 
     ''' Returns a copy of the property bag
     '''
     def copy(self):
+        if self._hooks:
+            self._fresh()
         return Bag(self.pb.copy())
 
+    ''' Returns a deep copy of the property bag
+
+        Copies without recursion, so any depth works. Subtrees shared
+        within the bag are copied once and cycles are kept.
+    '''
+    def deepcopy(self):
+        from . import tree
+        return Bag(tree.deepcopy(self.as_dict()))
+
+    ''' Returns a shallow copy, for copy.copy()
+    '''
+    def __copy__(self):
+        return self.copy()
+
+    ''' Returns a deep copy, for copy.deepcopy()
+    '''
+    def __deepcopy__(self, memo):
+        from . import tree
+        return Bag(tree.deepcopy(self.as_dict(), memo))
+
+    ''' Yields (path, value, depth) for every value in the bag
+        @param [in] sep     - Key separator to join the paths with,
+                              None for tuples of keys
+        @param [in] paths   - False to yield the last key instead of the
+                              path, which is faster for very deep bags
+
+        Goes depth first without recursion into dicts, lists and Bags, a
+        shared subtree or a cycle is only descended into once.
+
+        Example:
+        @begincode
+
+            for path, v, depth in pb.walk('.'):
+                if not isinstance(v, dict):
+                    print(path, v)
+
+        @endcode
+    '''
+    def walk(self, sep=None, paths=True):
+        from . import tree
+        if sep is None or not paths:
+            return tree.walk(self.as_dict(), paths)
+        return ((sep.join(str(k) for k in p), v, n) for p, v, n in tree.walk(self.as_dict()))
+
+    ''' Compares values with another Bag, dict or list without recursion
+        @param [in] other   - Bag, dict or list
+
+        Same result as ==, for trees of any depth.
+    '''
+    def deep_equal(self, other):
+        from . import tree
+        if isinstance(other, Bag):
+            other = other.as_dict()
+        return tree.equal(self.as_dict(), other)
+
+    ''' Alias for deep_equal()
+    '''
+    deepEqual = deep_equal
+
+    ''' Returns the shape of the bag, see propertybag.tree.stats()
+
+        @returns dict with containers, leaves, max_depth, mean_depth,
+                 max_width, shared and cycles
+    '''
+    def depth_stats(self):
+        from . import tree
+        return tree.stats(self.as_dict())
+
+    ''' Alias for depth_stats()
+    '''
+    depthStats = depth_stats
+
     ''' Converts properties to a json string
         @param [in] pretty      - Non-zero for a human friendly output
         @param [in] indent      - If pretty is set, set the indent size
         @param [in] sort_keys   - If pretty is set, sorts the keys when set
     '''
     def to_json(self, pretty=False, indent=2, sort_keys=True):
+        if self._hooks:
+            self._fresh()
         if not pretty:
             return json.dumps(self.pb)
         else:
@@ -562,12 +1090,52 @@ class Bag(dict):
     toJson = to_json
 
     ''' Initializes the object with the specified JSON string
-        @param [in] s   - JSON string
+        @param [in] s       - JSON string
+        @param [in] intern  - Interning, see the constructor
     '''
-    def from_json(s):
-        self.pb = json.loads(s)
+    def from_json(self, s, intern=None):
+        self.set(None, (_loads or _internLoads())(s, intern))
+        return self
 
     ''' Alias for from_json()
     '''
     fromJson = from_json
 
+    ''' Loads a config file into a new Bag
+        @param [in] path    - File name, .json, .toml, .ini, .env or .yaml
+        @param [in] fmt     - Format if the extension is not one of these
+        @param [in] cache   - Parsed result cache directory, True for the
+                              default one, see propertybag.loaders
+        @param [in] prefix  - For env files, variable name prefix
+
+        Example:
+        @begincode
+
+            cfg = pb.Bag.load_file('config.toml', cache=True)
+
+        @endcode
+    '''
+    @staticmethod
+    def load_file(path, fmt=None, cache=False, prefix=None):
+        from . import loaders
+        return Bag(loaders.load_file(path, fmt, cache, prefix))
+
+    ''' Alias for load_file()
+    '''
+    loadFile = load_file
+
+    ''' Loads PREFIX__A__B=value environment variables into a new Bag
+        @param [in] prefix  - Variable name prefix, None for all variables
+        @param [in] environ - Mapping to read instead of os.environ
+        @param [in] sep     - Separator between levels in the names
+    '''
+    @staticmethod
+    def load_env(prefix, environ=None, sep='__'):
+        from . import loaders
+        return Bag(loaders.load_env(prefix, environ, sep))
+
+    ''' Alias for load_env()
+    '''
+    loadEnv = load_env
+
+Bag._View = Bag
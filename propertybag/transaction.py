@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+
+#==================================================================================================
+''' class Transaction
+
+    Undo log for a Bag, returned by Bag.transaction() and Bag.savepoint().
+
+    Only the keys that are changed through the Bag API are recorded, so
+    commit() is O(1) and rollback() is O(changes). Transactions nest,
+    an inner transaction is a savepoint inside the outer one.
+
+    @begincode
+
+        with bag.transaction():
+            bag.a.b = 1
+            with bag.savepoint() as sp:
+                bag.delete('c')
+                sp.rollback()           # Restores 'c', keeps a.b
+            raise ValueError()          # Undoes a.b, error propagates
+
+    @endcode
+'''
+class Transaction():
+
+    ''' Constructor
+        @param [in] bag     - Bag to track, changes anywhere in its tree are recorded
+    '''
+    def __init__(self, bag):
+        root = bag._rootBag()
+        self.root = root
+        self.parent = root.__dict__.get('_tx')
+        if self.parent is None:
+            self.log = []
+            root.add_hook(self._record)
+        else:
+            self.log = self.parent.log
+        self.mark = len(self.log)
+        self.open = True
+        root.__dict__['_tx'] = self
+
+    ''' Write hook, records how to undo a change
+    '''
+    def _record(self, op, path, d, k, v):
+        if 'replace' == op:
+            self.log.append((op, path, d, k, True, d.__dict__['pb']))
+        else:
+            had = k in d
+            self.log.append((op, path, d, k, had, d[k] if had else None))
+
+    ''' Closes this transaction
+    '''
+    def _close(self):
+        if not self.open:
+            raise ValueError('Transaction is already closed')
+        if self.root.__dict__.get('_tx') is not self:
+            raise ValueError('Transaction is not the innermost open transaction')
+        self.open = False
+        self.root.__dict__['_tx'] = self.parent
+        if self.parent is None:
+            self.root.remove_hook(self._record)
+
+    ''' Keeps the changes
+
+        Changes made inside a savepoint become part of the enclosing
+        transaction and are undone if that one rolls back.
+    '''
+    def commit(self):
+        self._close()
+        if self.parent is None:
+            self.log = []
+
+    ''' Undoes every change made since this transaction started
+    '''
+    def rollback(self):
+        self._close()
+        log = self.log
+        outer = self
+        while outer.parent is not None:
+            outer = outer.parent
+        hooks = [f for f in self.root.__dict__['_hooks'] if f != outer._record]
+        while len(log) > self.mark:
+            op, path, d, k, had, old = log.pop()
+            if 'replace' == op:
+                for f in hooks:
+                    f('replace', path, d, None, old)
+                d.__dict__['pb'] = old
+            elif had:
+                for f in hooks:
+                    f('set', path, d, k, old)
+                d[k] = old
+            elif k in d:
+                for f in hooks:
+                    f('del', path, d, k, None)
+                del d[k]
+        if self.parent is None:
+            self.log = []
+
+    ''' Returns the number of recorded changes
+    '''
+    def __len__(self):
+        return len(self.log) - self.mark
+
+    def __enter__(self):
+        return self
+
+    ''' Commits, or rolls back if an exception is leaving the block
+    '''
+    def __exit__(self, t, e, tb):
+        if self.open:
+            if t is None:
+                self.commit()
+            else:
+                self.rollback()
+        return False
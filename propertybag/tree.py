@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+from __future__ import print_function
+
+import copy
+
+from . propertybag import Bag
+
+''' Non recursive tree traversal
+
+    walk(), deepcopy(), equal() and stats() keep their own stack instead of
+    recursing, so they work on trees of any depth, where dict ==,
+    json.dumps() and copy.deepcopy() hit the recursion limit. They descend
+    into dicts, lists and Bags.
+
+    A container reached a second time, because it is shared or part of a
+    cycle, is not descended into again. deepcopy() copies it once and
+    equal() compares each pair of containers once.
+'''
+
+# Types copied by reference
+ATOMIC = frozenset((str, int, float, bool, type(None), bytes, complex))
+
+# deepcopy() copies containers with more items than this in bulk
+BULK = 8
+
+
+''' Returns the children of a container as (key, value) pairs, None if
+    it is not a container
+'''
+def children(v):
+    t = type(v)
+    if t is dict:
+        return v.items()
+    if t is list:
+        return enumerate(v)
+    if isinstance(v, Bag):
+        return v.__dict__['pb'].items()
+    if isinstance(v, dict):
+        return v.items()
+    return None
+
+''' Yields (path, value, depth) for every value below a container
+    @param [in] root    - dict, list or Bag
+    @param [in] paths   - False to yield the last key instead of the path
+
+    Values are yielded depth first in key order, path is a tuple of keys
+    and depth its length. Building the paths costs O(depth) per value,
+    without them a walk is O(1) per value at any depth.
+'''
+def walk(root, paths=True):
+    seen = {id(root)}
+    keys = []
+    stack = [iter(children(root))]
+    while stack:
+        for k, v in stack[-1]:
+            keys.append(k)
+            yield (tuple(keys) if paths else k), v, len(keys)
+            if type(v) not in ATOMIC:
+                c = children(v)
+                if c is not None and id(v) not in seen:
+                    seen.add(id(v))
+                    stack.append(iter(c))
+                    break
+            keys.pop()
+        else:
+            stack.pop()
+            if keys:
+                keys.pop()
+
+''' Returns a deep copy of a dict or list
+    @param [in] root    - dict or list
+    @param [in] memo    - copy.deepcopy() memo dict
+
+    Shared containers are copied once and cycles are kept. Other values
+    than dicts, lists and atomic types are copied with copy.deepcopy()
+    using the same memo.
+'''
+def deepcopy(root, memo=None):
+    if memo is None:
+        memo = {}
+    r = memo.get(id(root))
+    if r is not None:
+        return r
+    r = memo[id(root)] = [] if type(root) is list else {}
+    stack = [(root, r)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        src, dst = pop()
+        # Wide containers are copied in C, then the containers replaced
+        bulk = len(src) > BULK
+        if type(dst) is list:
+            if bulk:
+                dst.extend(src)
+            else:
+                dst.extend([None] * len(src))
+            kv = enumerate(src)
+        else:
+            if bulk:
+                dst.update(src)
+            kv = src.items()
+        for k, v in kv:
+            t = type(v)
+            if t in ATOMIC:
+                if not bulk:
+                    dst[k] = v
+                continue
+            if t is dict or t is list:
+                c = memo.get(id(v))
+                if c is None:
+                    c = memo[id(v)] = {} if t is dict else []
+                    push((v, c))
+            elif isinstance(v, Bag):
+                c = memo.get(id(v))
+                if c is None:
+                    c = memo[id(v)] = Bag()
+                    c.__dict__['pb'] = deepcopy(v.__dict__['pb'], memo)
+            else:
+                c = copy.deepcopy(v, memo)
+            dst[k] = c
+    return r
+
+''' Returns True if two trees hold equal values
+    @param [in] a       - dict, list or Bag
+    @param [in] b       - dict, list or Bag
+
+    Same result as a == b where that does not recurse too deep, a Bag
+    equals the dict it holds. A pair of containers met again is taken as
+    equal, which is how cycles compare.
+'''
+def equal(a, b):
+    seen = set()
+    stack = [(a, b)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        a, b = pop()
+        if isinstance(a, Bag):
+            a = a.__dict__['pb']
+        if isinstance(b, Bag):
+            b = b.__dict__['pb']
+        ta = type(a)
+        if ta is dict or isinstance(a, dict):
+            if not isinstance(b, dict) or len(a) != len(b):
+                return False
+            pair = (id(a), id(b))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            for k, v in a.items():
+                if k not in b:
+                    return False
+                w = b[k]
+                if v is w:
+                    continue
+                if type(v) in ATOMIC:
+                    if type(w) in ATOMIC:
+                        if v != w:
+                            return False
+                        continue
+                push((v, w))
+        elif ta is list:
+            if type(b) is not list or len(a) != len(b):
+                return False
+            pair = (id(a), id(b))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            for v, w in zip(a, b):
+                if v is not w:
+                    push((v, w))
+        elif isinstance(b, (dict, list, Bag)):
+            return False
+        elif a is not b and a != b:
+            return False
+    return True
+
+''' Returns statistics about the shape of a tree
+    @param [in] root    - dict, list or Bag
+
+    @returns dict with
+                - 'containers'  Number of distinct dicts, lists and Bags below root
+                - 'leaves'      Number of other values
+                - 'max_depth'   Depth of the deepest value
+                - 'mean_depth'  Mean depth of the leaves
+                - 'max_width'   Most children of one container, root included
+                - 'shared'      Containers reached again outside a cycle
+                - 'cycles'      Containers reached again from inside themselves
+'''
+def stats(root):
+    r = {'containers': 0, 'leaves': 0, 'max_depth': 0, 'mean_depth': 0.0,
+         'max_width': 0, 'shared': 0, 'cycles': 0}
+    c = children(root)
+    if c is None:
+        return r
+    seen = {id(root)}
+    active = {id(root)}
+    width = len(root)
+    total = 0
+    leaves = 0
+    containers = 0
+    deepest = 0
+    stack = [(root, iter(c))]
+    while stack:
+        top = stack[-1]
+        depth = len(stack)
+        for k, v in top[1]:
+            if type(v) in ATOMIC:
+                leaves += 1
+                total += depth
+                if depth > deepest:
+                    deepest = depth
+                continue
+            c = children(v)
+            if c is None:
+                leaves += 1
+                total += depth
+                if depth > deepest:
+                    deepest = depth
+                continue
+            if depth > deepest:
+                deepest = depth
+            i = id(v)
+            if i in seen:
+                if i in active:
+                    r['cycles'] += 1
+                else:
+                    r['shared'] += 1
+                continue
+            containers += 1
+            seen.add(i)
+            active.add(i)
+            if len(v) > width:
+                width = len(v)
+            stack.append((v, iter(c)))
+            break
+        else:
+            active.discard(id(top[0]))
+            stack.pop()
+    r['containers'] = containers
+    r['leaves'] = leaves
+    r['max_depth'] = deepest
+    r['mean_depth'] = total / float(leaves) if leaves else 0.0
+    r['max_width'] = width
+    return r
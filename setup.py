@@ -37,7 +37,7 @@ setup(
     author=cfg['author'],
     author_email=cfg['email'],
     license=cfg['license'],
-    packages=[cfg['name']],
+    packages=[cfg['name'], cfg['name'] + '.bench'],
     include_package_data = True,
     long_description=long_description,
     long_description_content_type='text/markdown'
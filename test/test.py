@@ -255,12 +255,939 @@ def test_5():
     _p = pb.Bag(a='b', c='d', e=pb.Bag(a='b'))
     Log(json.dumps(_p))
 
+def test_6():
+
+    rows = [{'a': {'b': 1}, 'c': 'x'}, {'a': {'b': 2}, 'c': 'y'}, {'a': {'b': 3}, 'd': 1.5}]
+    _t = pb.BagTable(rows)
+    Log(_t.to_ndjson())
+
+    assert len(_t) == 3
+    assert _t.columns() == ['a.b', 'c', 'd']
+    assert list(_t.column('a.b')) == [1, 2, 3]
+    assert _t.column('c') == ['x', 'y', None]
+    assert _t.column('c', '-') == ['x', 'y', '-']
+
+    _r = _t[1]
+    assert _r.a.b == 2
+    assert _r['c'] == 'y'
+    assert _r.get('a') == {'b': 2}
+    assert _r.get('d', 'missing') == 'missing'
+    assert _r.bag('a').b == 2
+    assert _r.exists('a.b')
+    assert not _r.exists('d')
+    assert 'd' not in _r
+    assert _r == rows[1]
+    assert not _t[0].z
+
+    _r.set('a.b', 20)
+    _r.e.f = 'g'
+    assert _t[1].a.b == 20
+    assert _t[1].as_dict() == {'a': {'b': 20}, 'c': 'y', 'e': {'f': 'g'}}
+
+    _f = _t.filter('a.b', lambda v: v > 2)
+    assert [r.a.b for r in _f] == [20, 3]
+    _f = _t.filter([True, False, False])
+    assert _f.to_dicts() == [rows[0]]
+    _f = _t.filter(lambda r: 'x' == r.c)
+    assert _f.to_dicts() == [rows[0]]
+    try:
+        _t.filter('a.b')
+        assert False
+    except ValueError:
+        pass
+
+    assert _t.to_bags()[2] == rows[2]
+    assert pb.BagTable.from_ndjson(_t.to_ndjson()).to_dicts() == _t.to_dicts()
+    assert pb.BagTable.from_bags([pb.Bag(r) for r in rows]).to_dicts() == rows
+
+    # Mixed types fall back to a list column
+    _t = pb.BagTable([{'a': 1}, {'a': 'one'}, {'a': 1.5}])
+    assert _t.column('a') == [1, 'one', 1.5]
+
+def test_7():
+
+    from propertybag import instrument
+
+    _get = pb.Bag.get
+    instrument.reset()
+    instrument.enable(sample_rate=1)
+    try:
+        assert instrument.enabled()
+        _p = pb.Bag({'a': {'b': 1}})
+        assert _p.get('a.b') == 1
+        assert _p.get('a.x', 'def') == 'def'
+        assert _p.a.b == 1
+        assert not _p.q.r
+        _p.c.d = 2
+        _p.set('a.b', 3)
+        _p['e'] = 4
+        assert _p.exists('e')
+    finally:
+        instrument.disable()
+
+    # Original methods are restored when disabled
+    assert pb.Bag.get is _get
+    assert not instrument.enabled()
+
+    st = instrument.stats()
+    Log(instrument.report())
+    assert st['a.b']['reads'] == 2
+    assert st['a.b']['writes'] == 1
+    assert st['a.b']['samples'] == 3
+    assert st['a.x']['misses'] == 1
+    assert st['q']['misses'] == 1
+    assert st['c.d']['writes'] == 1
+    assert st['e']['reads'] == 1
+    assert st['e']['writes'] == 1
+    assert instrument.hot(1)[0][0] == 'a.b'
+
+    m = instrument.metrics()
+    assert m['propertybag_reads_total{path="a.b"}'] == 2
+
+    instrument.reset()
+    assert not instrument.stats()
+
+def test_8():
+
+    from propertybag import bench
+
+    _t = pb.Bag(bench.makeTree(100, 3))
+    for p in bench.makeKeys(100, 3, 1.0)[:10]:
+        assert _t.exists('.'.join(p))
+    for p in bench.makeKeys(100, 3, 0.0)[:10]:
+        assert not _t.exists('.'.join(p))
+
+    assert 'get' in bench.cases()
+
+    r = bench.run({'size': [100], 'depth': [1], 'hit': [1.0]}, ['get'], repeat=1, mintime=0.001)
+    assert 'get/depth=1/hit=1.0/size=100' in r['results']
+
+    old = {'results': {'a': {'sec': 1.0}, 'b': {'sec': 1.0}, 'c': {'sec': 1.0}}}
+    new = {'results': {'a': {'sec': 1.5}, 'b': {'sec': 1.05}, 'c': {'sec': 0.5}}}
+    flags = {k: f for k, o, n, r, f in bench.compare(old, new, 0.1)}
+    assert flags == {'a': 'regression', 'b': '', 'c': 'improvement'}
+
+def test_9():
+
+    import json
+
+    s = '{"a": {"b": [1, {"c": "]}"}]}, "d":  {"e":1},"f": "g", "h": [[[[[[[[[[1]]]]]]]]]]}'
+
+    _p = pb.LazyBag(s)
+    assert _p.is_lazy()
+    assert _p.get('d.e') == 1
+    assert _p.f == 'g'
+    assert _p.h[0][0][0][0][0][0][0][0][0] == [1]
+    assert 'a' in _p
+    assert 'x' not in _p
+    assert len(_p) == 4
+    assert list(_p) == ['a', 'd', 'f', 'h']
+
+    # Untouched values are copied through as is
+    assert _p.to_json() == '{"a": {"b": [1, {"c": "]}"}]}, "d": {"e": 1}, "f": "g", "h": [[[[[[[[[[1]]]]]]]]]]}'
+    assert _p.is_lazy()
+
+    _p.d.e = 2
+    _p.x.y = 3
+    del _p.a
+    assert _p.get('d.e') == 2
+    assert _p.exists('x.y')
+    assert not _p.exists('a')
+    assert _p == {'d': {'e': 2}, 'f': 'g', 'h': [[[[[[[[[[1]]]]]]]]]], 'x': {'y': 3}}
+    assert not _p.is_lazy()
+    assert list(_p) == ['d', 'f', 'h', 'x']
+
+    _p = pb.LazyBag(s.encode('utf-8'))
+    assert _p.bag('a').b[1] == {'c': ']}'}
+    assert _p.delete('f')
+    assert not _p.delete('f')
+    assert pb.Bag(_p.to_json()) == _p
+    assert pb.Bag(s) == pb.LazyBag(s)
+
+    # Internal state does not hide keys
+    _p = pb.LazyBag('{"src": 1, "pos": 2, "raw": 3, "order": 4}')
+    assert _p.src == 1
+    assert _p.order == 4
+
+    # Values nested deeper than the member regex, with commas inside
+    deep = {'a': [[[[[[[[{'x': 1, 'y': [2, 3]}]]]]]]]], 'b': 3, 'c': [[[[[[[[[1, 2]]]]]]]]]}
+    for j in (json.dumps(deep), json.dumps(deep, separators=(',', ':')), json.dumps(deep, indent=1)):
+        _p = pb.LazyBag(j)
+        assert _p.b == 3
+        assert list(_p.keys()) == ['a', 'b', 'c']
+        assert json.loads(_p.to_json()) == deep
+        assert _p == deep
+
+    # The last value of a repeated key wins, as with json
+    assert pb.LazyBag('{"a": 1, "a": 2}').a == 2
+    _p = pb.LazyBag('{"a": 1, "b": 2, "a": 3}')
+    assert _p.b == 2
+    assert _p.a == 3
+    assert list(_p.keys()) == ['a', 'b']
+
+    _p = pb.LazyBag('{}')
+    assert not _p.is_lazy()
+    assert 0 == len(_p)
+
+    fail = False
+    try:
+        pb.LazyBag('{"a": [1, 2}').a
+    except ValueError as e:
+        fail = True
+    assert fail
+
+def test_10():
+
+    _p = pb.Bag({'a': {'b': 1}, 'c': 2, 'l': [1, 2]})
+    _o = pb.Bag({'a': {'b': 1}, 'c': 2, 'l': [1, 2]})
+
+    # Rollback on exception
+    fail = False
+    try:
+        with _p.transaction() as tx:
+            _p.a.b = 10
+            _p.x.y.z = 'new'
+            _p.set('c', 3)
+            _p['d'] = 4
+            _p.delete('l')
+            _p.merge({'c': 5, 'e': 6})
+            _p.update({'f': 7})
+            _p.a.bag('q', 0)
+            assert len(tx) > 0
+            raise ValueError('validation failed')
+    except ValueError:
+        fail = True
+    assert fail
+    assert _p == _o
+
+    # Commit keeps changes
+    with _p.transaction():
+        _p.set('a.b', 20)
+        del _p.c
+    assert _p == {'a': {'b': 20}, 'l': [1, 2]}
+    assert not _p._hookList()
+
+    # Nested savepoints
+    with _p.transaction() as tx:
+        _p.s = 1
+        with _p.savepoint() as sp:
+            _p.t = 2
+            sp.rollback()
+        with _p.savepoint():
+            _p.u = 3
+        assert 's' in _p and 't' not in _p and 'u' in _p
+        tx.rollback()
+    assert _p == {'a': {'b': 20}, 'l': [1, 2]}
+
+    # Replacing the whole bag
+    tx = _p.transaction()
+    _p.set(None, {'z': 1})
+    assert _p == {'z': 1}
+    tx.rollback()
+    assert _p == {'a': {'b': 20}, 'l': [1, 2]}
+
+    # Only the innermost transaction can be closed
+    tx = _p.transaction()
+    sp = _p.savepoint()
+    fail = False
+    try:
+        tx.commit()
+    except ValueError:
+        fail = True
+    assert fail
+    sp.commit()
+    tx.commit()
+
+    # Hooks see changes made through nested bags
+    ops = []
+    _p.add_hook(lambda op, path, d, k, v: ops.append((op, path)))
+    _p.a.b = 1
+    _p.m.n = 2
+    _p.bag('a').delete('b')
+    assert ops == [('set', ('a', 'b')), ('make', ('m',)), ('set', ('m', 'n')), ('del', ('a', 'b'))]
+
+    # Replacing a nested bag sets its value in the parent
+    del ops[:]
+    _p.m.set(None, {'o': 3})
+    assert ops == [('set', ('m',))]
+    assert _p.m == {'o': 3} and 'a' in _p
+    with _p.transaction() as tx:
+        _p.a.from_json('{"r": 4}')
+        assert _p.a == {'r': 4}
+        tx.rollback()
+    assert _p.a == {}
+
+    _p = pb.LazyBag('{"a": 1, "b": {"c": 2}}')
+    with _p.transaction() as tx:
+        _p.a = 5
+        del _p.b
+        tx.rollback()
+    assert _p == {'a': 1, 'b': {'c': 2}}
+
+
+def test_11():
+
+    import os
+    import json
+    import shutil
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmp, 'state.json')
+        jn = fn + '.journal'
+
+        # Every kind of change survives a restart
+        with pb.PersistentBag(fn, compact_size=0) as _p:
+            _p.a.b = 1
+            _p.set('c.d', [1, 2])
+            _p['e'] = 'f'
+            _p.merge({'g': 1, 'h': {'i': 2}})
+            _p.update(j=3)
+            _p.h.i = 4
+            _p.bag('c').set('x', True)
+            _p.delete('g')
+            del _p.j
+            _p.k = pb.Bag({'l': 5})
+        _o = {'a': {'b': 1}, 'c': {'d': [1, 2], 'x': True}, 'e': 'f', 'h': {'i': 4}, 'k': {'l': 5}}
+        _p = pb.PersistentBag(fn)
+        assert _p == _o
+        assert not os.path.exists(fn)
+        assert 0 < _p.journal_size()
+
+        # Changes after close are refused
+        _p.close()
+        fail = False
+        try:
+            _p.z = 1
+        except ValueError:
+            fail = True
+        assert fail and 'z' not in _p
+
+        # A journal cut off in the middle of a line
+        with pb.PersistentBag(fn, compact_size=0) as _p:
+            _p.m = 1
+            _p.n = 2
+        with open(jn, 'rb') as f:
+            full = f.read()
+        with open(jn, 'wb') as f:
+            f.write(full[:-5])
+        _p = pb.PersistentBag(fn)
+        assert _p.m == 1 and 'n' not in _p
+        assert os.path.getsize(jn) == len(full) - len(full.splitlines(True)[-1])
+        _p.n = 3
+        _p.close()
+        assert pb.PersistentBag(fn).n == 3
+
+        # A damaged line stops the replay
+        with open(jn, 'rb') as f:
+            lines = f.read().splitlines(True)
+        bad = lines[-2][:9] + lines[-2][9:].replace(b'1', b'7')
+        with open(jn, 'wb') as f:
+            f.write(b''.join(lines[:-2] + [bad, lines[-1]]))
+        _p = pb.PersistentBag(fn)
+        assert 'm' not in _p and 'n' not in _p and _p.a.b == 1
+        _p.close()
+
+        # Compaction writes a snapshot and starts a new journal
+        for bg in (False, True):
+            with pb.PersistentBag(fn, batch=8, sync='never', compact_size=512, background=bg) as _p:
+                for i in range(200):
+                    _p.set('cnt.v%d' % (i % 20), i)
+                _o = _p.as_dict().copy()
+            assert os.path.exists(fn)
+            assert not os.path.exists(jn + '.old')
+            assert bg or os.path.getsize(jn) < 1024
+            assert pb.PersistentBag(fn) == _o
+
+        # Crash during compaction, both journals are replayed
+        with pb.PersistentBag(fn, compact_size=0) as _p:
+            _p.cnt.v0 = 'old'
+        os.replace(jn, jn + '.old')
+        with pb.PersistentBag(fn, compact_size=0) as _p:
+            assert _p.cnt.v0 == 'old'
+            _p.cnt.v1 = 'new'
+        shutil.copy(jn, jn + '.old')
+        _p = pb.PersistentBag(fn)
+        assert _p.cnt.v0 == 'old' and _p.cnt.v1 == 'new'
+        assert not os.path.exists(jn + '.old')
+        _p.close()
+
+        # Replacing a nested bag and non-string keys survive a restart
+        with pb.PersistentBag(fn, compact_size=0) as _p:
+            _p.r.s = 2
+            _p.r.set(None, {'z': 9})
+            _p.bag('cnt').from_json('{"v0": "old"}')
+            _p.q = {}
+            _p.q[1] = 'one'
+            _o = _p.as_dict().copy()
+        _o['q'] = {'1': 'one'}
+        assert pb.PersistentBag(fn) == _o
+        line = pb.persist.encodeOp('replace', ('r',), {'y': 8})
+        assert pb.persist.replay({'a': 1}, [json.loads(line[9:])]) == {'a': 1, 'r': {'y': 8}}
+
+        # Rolled back changes are journaled too
+        with pb.PersistentBag(fn) as _p:
+            with _p.transaction() as tx:
+                _p.cnt.v0 = 'tx'
+                tx.rollback()
+        assert pb.PersistentBag(fn).cnt.v0 == 'old'
+
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_12():
+
+    a = '{"name": "alpha", "status": "active", "note": "%s", "sub": {"status": "active"}}' % ('x' * 40)
+    b = '{"name": "beta", "status": "active", "note": "%s", "sub": {"status": "active"}}' % ('x' * 40)
+
+    # Keys and short values are shared between loads
+    t = pb.InternTable()
+    _a = pb.Bag(a, _intern=t)
+    _b = pb.Bag(b, _intern=t)
+    assert _a == pb.Bag(a)
+    ka = [k for k in _a.keys() if 'status' == k][0]
+    kb = [k for k in _b.keys() if 'status' == k][0]
+    assert ka is kb
+    assert _a.status is _b.status
+    assert _a.sub.status is _b.status
+    assert _a.note is not _b.note
+    assert 0 < t.stats()['bytes']
+
+    # Keys only
+    t = pb.InternTable(values=False)
+    _a = pb.Bag(a, _intern=t)
+    _b = pb.Bag(b, _intern=t)
+    assert _a.status is not _b.status
+    assert 0 == len(t)
+
+    # Bounded table keeps sharing what it has
+    t = pb.InternTable(max_entries=2)
+    pb.Bag('{"a": "v1", "b": "v2", "c": "v3"}', _intern=t)
+    assert t.stats()['full']
+    n = len(t)
+    _a = pb.Bag('{"a": "v1", "d": "v4"}', _intern=t)
+    _b = pb.Bag('{"a": "v1", "d": "v4"}', _intern=t)
+    assert _a.a is _b.a
+    assert _a.d is not _b.d
+    assert n == len(t)
+
+    # Default interning for all loaders
+    pb.intern.set_default(True)
+    try:
+        _a = pb.Bag(a)
+        _b = pb.Bag().from_json(b)
+        assert _a.status is _b.status
+        assert pb.LazyBag(a).sub.status is _b.status
+        tb = pb.BagTable.from_ndjson(a + '\n' + b)
+        assert tb[1] == _b.as_dict()
+        assert pb.Bag(a, _intern=False).status is not _b.status
+    finally:
+        pb.intern.set_default(None)
+    assert pb.Bag(a).status is not pb.Bag(b).status
+
+    # An empty table is a table, not False
+    t = pb.InternTable()
+    pb.intern.set_default(t)
+    try:
+        assert pb.Bag(a).status is pb.Bag(b).status
+        assert 0 < len(t)
+    finally:
+        pb.intern.set_default(None)
+
+    # from_json() replaces the contents and reports to hooks
+    _p = pb.Bag({'x': 1})
+    with _p.transaction() as tx:
+        _p.from_json(a)
+        assert _p.name == 'alpha' and 'x' not in _p
+        tx.rollback()
+    assert _p == {'x': 1}
+
+    fail = False
+    try:
+        pb.Bag(a, _intern='yes')
+    except ValueError:
+        fail = True
+    assert fail
+
+
+def test_13():
+
+    d = {'a': {'b': 1, 'c': [1, {'x': 2}]}, 'd': 'e', 'f': {'g': {'h': None}}}
+    _a = pb.Bag(d)
+    _b = pb.Bag({'f': {'g': {'h': None}}, 'd': 'e', 'a': {'c': [1, {'x': 2}], 'b': 1.0}})
+
+    # Equal contents give equal fingerprints, in any order
+    assert _a.fingerprint() == _b.fingerprint()
+    assert _a.fingerprint('a.b') == _b.fingerprint('a.b')
+    assert _a.fingerprint('f.g') == _b.f.fingerprint('g')
+    assert _a.fingerprint('missing') is None
+    assert pb.Bag({'a': 1}).fingerprint() != pb.Bag({'a': '1'}).fingerprint()
+    assert pb.Bag({'a': [1]}).fingerprint() != pb.Bag({'a': (1,)}).fingerprint()
+    assert pb.Bag({'a': {}}).fingerprint() != pb.Bag({'a': []}).fingerprint()
+    assert _a == _b
+    assert _a.diff(_b) == []
+
+    # Writes through the Bag API update the fingerprints
+    fa = _a.fingerprint('a')
+    ff = _a.fingerprint('f')
+    _a.f.g.h = 1
+    assert _a.fingerprint('a') == fa
+    assert _a.fingerprint('f') != ff
+    assert _a != _b
+    assert _a.diff(_b) == ['f.g.h']
+    _a.f.g.h = None
+    assert _a.fingerprint('f') == ff
+    assert _a == _b
+
+    _a.set('a.n.m', 1)
+    _b.bag('a').delete('b')
+    _b['z'] = 2
+    assert sorted(_a.diff(_b)) == ['a.b', 'a.n', 'z']
+    assert sorted(_a.diff(_b.as_dict())) == ['a.b', 'a.n', 'z']
+
+    _a.delete('a.n')
+    _a.merge({'z': 2})
+    _b.a.b = 1
+    assert _a == _b
+    assert _a == _b.as_dict()
+
+    # Rolled back changes are seen too
+    with _a.transaction() as tx:
+        _a.d = 'changed'
+        assert _a != _b
+        tx.rollback()
+    assert _a == _b
+    _a.set(None, {'q': 1})
+    assert _a != _b and _a.fingerprint() == pb.Bag({'q': 1}).fingerprint()
+
+    # Direct changes need clear_fingerprints()
+    _a = pb.Bag(d)
+    _b = pb.Bag(d).copy()
+    assert _a.same_fingerprint(_b)
+    _b.as_dict()['d'] = 'x'
+    assert _a.same_fingerprint(_b)
+    assert _a != _b
+    _b.clear_fingerprints()
+    assert not _b._hookList()
+    assert not _a.sameFingerprint(_b)
+    assert not _a.same_fingerprint(_b.as_dict())
+    assert _a.same_fingerprint(d)
+
+    # == compares the contents, also of nested dicts shared between bags
+    _a = pb.Bag({'x': {'y': 1}})
+    _b = _a.copy()
+    _a.fingerprint()
+    _b.fingerprint()
+    _b.x.y = 2
+    assert _a == _b and not _a != _b
+    _a = pb.Bag({'x': 1})
+    _b = pb.Bag({'x': 1})
+    _a.fingerprint()
+    _b.fingerprint()
+    pb.Bag(_a.as_dict()).x = 2
+    assert _a != _b and not _a == _b
+
+
+def test_14():
+
+    import os
+    import json
+    import shutil
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    try:
+        files = []
+        for i in range(50):
+            fn = os.path.join(tmp, 'doc%d.json' % i)
+            with open(fn, 'w') as f:
+                json.dump({'id': i, 'user': {'name': 'u%d' % i, 'age': i % 7}, 'tags': ['a']}, f)
+            files.append(fn)
+        nd = os.path.join(tmp, 'docs.ndjson')
+        with open(nd, 'w') as f:
+            for i in range(50):
+                f.write(json.dumps({'id': i, 'user': {'name': 'u%d' % i}}) + '\n')
+                if 0 == i % 10:
+                    f.write('\n')
+
+        for mode in ('process', 'thread'):
+            for workers in (0, 2):
+                r = list(pb.load_many(files, workers=workers, mode=mode, chunksize=4, max_inflight=2))
+                assert [b.id for b in r] == list(range(50))
+                assert r[3].user.name == 'u3'
+                assert isinstance(r[3], pb.Bag)
+
+                r = list(pb.load_many(files, workers=workers, mode=mode, ordered=False, chunksize=3))
+                assert sorted(b.id for b in r) == list(range(50))
+
+                r = list(pb.load_many(nd, workers=workers, mode=mode, kind='ndjson', chunksize=8,
+                                      paths=['user.name', 'missing.key']))
+                assert 50 == len(r)
+                assert r[7] == {'user': {'name': 'u7'}}
+
+        r = list(pb.load_many(['{"a": 1}', b'{"a": 2}'], kind='json', workers=0, intern=True))
+        assert [b.a for b in r] == [1, 2]
+
+        # Errors name the document
+        with open(nd, 'a') as f:
+            f.write('{"id": \n')
+        for workers in (0, 2):
+            fail = False
+            try:
+                list(pb.load_many(nd, workers=workers, kind='ndjson'))
+            except ValueError as e:
+                fail = 'docs.ndjson:56' in str(e)
+            assert fail
+
+        fail = False
+        try:
+            pb.load_many(files, mode='fiber')
+        except ValueError:
+            fail = True
+        assert fail
+
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_15():
+
+    import time
+
+    now = [0.0]
+    clock = lambda: now[0]
+
+    # Time to live, from the default, rules or set()
+    _p = pb.CacheBag({'static': 1}, ttl=10, clock=clock)
+    _p.set_ttl('user.*.session', 2)
+    _p.user[1].profile = {'name': 'a'}
+    _p.user[1].session = 's1'
+    _p.set('cfg', 'x', ttl=0)
+    _p.set('tmp', 'y', ttl=5)
+    assert 4 == _p.stats()['entries']
+
+    # A key is more specific than '*'
+    _p.set_ttl('user.alice.session', 100)
+    _p.user.alice.session = 's2'
+
+    now[0] = 3
+    assert _p.user[1].get('session') is None
+    assert 's2' == _p.user.alice.session
+    del _p.user.alice
+    assert _p.user[1].profile.name == 'a'
+    assert 'tmp' in _p
+
+    # None never expires, also below a rule with a time to live
+    t = [0.0]
+    _q = pb.CacheBag(ttl=10, clock=lambda: t[0])
+    _q.set_ttl('config', None)
+    _q.set_ttl('user', 5)
+    _q.set_ttl('user.admin', None)
+    _q.config.a = 1
+    _q.user.admin = 'x'
+    _q.user.guest = 'y'
+    t[0] = 100
+    assert _q == {'config': {'a': 1}, 'user': {'admin': 'x'}}
+
+    # Changes inside an entry keep its expiry
+    _p.user[1].profile.name = 'b'
+    assert 3 == _p.stats()['entries']
+
+    now[0] = 10
+    assert _p == {'static': 1, 'user': {1: {}}, 'cfg': 'x'}
+    st = _p.stats()
+    assert 1 == st['entries'] and 3 == st['expired']
+    assert 0 == _p.expire()
+
+    # Rewriting an entry starts a new time to live
+    _p.k = 1
+    now[0] = 15
+    _p.k = 2
+    now[0] = 21
+    assert 2 == _p.get('k')
+    now[0] = 26
+    assert not _p.exists('k')
+
+    # Least recently used
+    _p = pb.CacheBag(max_entries=3, clock=clock)
+    for i in range(3):
+        _p[i] = i
+    assert 0 == _p[0]
+    _p[3] = 3
+    assert sorted(_p.keys()) == [0, 2, 3]
+    _p.set('n.a', 1)
+    _p.n.b = 2
+    assert set(_p.keys()) == {3, 'n'}
+    assert _p.n == {'a': 1, 'b': 2}
+    st = _p.stats()
+    assert 3 == st['evictions'] and 1 == st['hits']
+
+    # Least frequently used
+    _p = pb.CacheBag(max_entries=3, policy='lfu', clock=clock)
+    for i in range(3):
+        _p.set('k%d' % i, i)
+    for i in range(3):
+        _p.k0
+        _p.get('k2')
+    _p.k3 = 3
+    _p.k4 = 4
+    assert sorted(_p.keys()) == ['k0', 'k2', 'k4']
+    assert 6 == _p.stats()['hits']
+    assert 0 == _p.get('missing', 0)
+    assert 1 == _p.stats()['misses']
+
+    # The entry being added is the only least used one
+    _q = pb.CacheBag(max_entries=2, policy='lfu', clock=clock)
+    _q.a = 1
+    _q.a
+    _q.b = 2
+    _q.b
+    _q.c = 3
+    assert sorted(_q.keys()) == ['b', 'c']
+
+    # Deleting and replacing forget entries
+    _p.delete('k0')
+    del _p.k2
+    assert 1 == _p.stats()['entries']
+    _p.set(None, {'a': 1})
+    assert 0 == _p.stats()['entries']
+
+    # Background sweep
+    with pb.CacheBag(ttl=0.01, sweep=0.01) as _p:
+        _p.a = 1
+        for i in range(200):
+            if 'a' not in _p.as_dict():
+                break
+            time.sleep(0.01)
+        assert 1 == _p.stats()['expired']
+
+    fail = False
+    try:
+        pb.CacheBag(policy='mru')
+    except ValueError:
+        fail = True
+    assert fail
+
+
+def test_16():
+
+    calls = []
+    def url(b):
+        calls.append(1)
+        return '%s:%d' % (b.db.host, b.db.get('port'))
+
+    # Computed once, then stored
+    _p = pb.Bag({'db': {'host': 'h', 'port': 1}, 'x': 1})
+    _p.compute('db.url', url)
+    _p.compute('full', lambda b: b.db.url + '?x=%d' % b.x)
+    assert 'h:1?x=1' == _p.full
+    assert 'h:1' == _p.db.url
+    assert 'h:1' == _p.get('db.url')
+    assert 1 == len(calls)
+
+    # Only the affected values are computed again
+    _p.x = 2
+    assert 'h:1?x=2' == _p.full
+    assert 1 == len(calls)
+    _p.db.port = 2
+    assert 'h:2?x=2' == _p.get('full')
+    assert 2 == len(calls)
+    _p.set('db', {'host': 'g', 'port': 3})
+    assert {'db': {'host': 'g', 'port': 3, 'url': 'g:3'}, 'x': 2, 'full': 'g:3?x=2'} == _p.as_dict()
+    assert 3 == len(calls)
+
+    # Setting overrides until a dependency changes, deleting recomputes
+    _p.db.url = 'over'
+    assert 'over?x=2' == _p.full
+    _p.db.host = 'f'
+    assert 'f:3?x=2' == _p.full
+    del _p.db.url
+    assert 'url' in _p.db
+    assert _p.exists('db.url')
+
+    # Rollback
+    try:
+        with _p.transaction():
+            _p.db.port = 9
+            assert 'f:9' == _p.db.url
+            raise KeyError('x')
+    except KeyError:
+        pass
+    assert 'f:3' == _p.db.url
+
+    # Relative to a nested bag, and below a missing dict
+    _p.db.compute('n.len', lambda b: len(b.host))
+    assert 1 == _p.get('db.n.len')
+    assert {'len': 1} == _p.db.n.as_dict()
+    _p.db.host = 'abc'
+    assert 3 == _p.db.n.len
+
+    assert _p.uncompute('full')
+    assert not _p.exists('full')
+    assert not _p.uncompute('full')
+
+    # Fingerprints see computed values
+    _p.fingerprint()
+    f = _p.fingerprint('db')
+    _p.db.port = 4
+    assert 'abc:4' == _p.db.url
+    assert f != _p.fingerprint('db')
+
+    fail = False
+    _c = pb.Bag()
+    _c.compute('a', lambda b: b.b)
+    _c.compute('b', lambda b: b.a)
+    try:
+        _c.a
+    except ValueError:
+        fail = True
+    assert fail
+
+
+def test_17():
+
+    import os
+    import shutil
+    import tempfile
+
+    tmp = tempfile.mkdtemp()
+    try:
+        files = {
+            'a.json': '{"db": {"host": "h", "port": 1}}',
+            'a.toml': '[db]\nhost = "h"\nport = 1\n',
+            'a.ini': '[db]\nhost = h\nport = 1\n',
+            '.env': '# comment\nexport APP__DB__HOST="h"\nAPP__DB__PORT=1\nOTHER=x\n',
+        }
+        for k, v in files.items():
+            with open(os.path.join(tmp, k), 'w') as f:
+                f.write(v)
+
+        for k in files:
+            _p = pb.Bag.load_file(os.path.join(tmp, k), prefix='APP')
+            assert 'h' == _p.db.host
+            assert 1 == int(_p.db.port)
+
+        # Parsed result cache
+        fname = os.path.join(tmp, 'a.json')
+        cache = os.path.join(tmp, 'cache')
+        _p = pb.Bag.load_file(fname, cache=cache)
+        assert 1 == len(os.listdir(cache))
+        assert _p == pb.Bag.load_file(fname, cache=cache)
+        with open(fname, 'w') as f:
+            f.write('{"db": {"host": "g", "port": 22}}')
+        assert 22 == pb.Bag.load_file(fname, cache=cache).db.port
+        assert 1 == len(os.listdir(cache))
+
+        # Dates and times read back as such
+        fname = os.path.join(tmp, 'd.toml')
+        with open(fname, 'w') as f:
+            f.write('a = 1979-05-27T07:32:00-08:00\nb = 1979-05-27\n[c]\nd = [07:32:00]\n')
+        _p = pb.Bag.load_file(fname, cache=cache)
+        assert 2 == len(os.listdir(cache))
+        assert _p == pb.Bag.load_file(fname, cache=cache)
+        assert 1979 == pb.Bag.load_file(fname, cache=cache).b.year
+
+        assert {'db': {'host': 'h'}} == pb.Bag.load_env('APP', {'APP__DB__HOST': 'h', 'X': '1'})
+
+        fail = False
+        try:
+            pb.Bag.load_file(os.path.join(tmp, 'a.txt'))
+        except ValueError:
+            fail = True
+        assert fail
+
+    finally:
+        shutil.rmtree(tmp)
+
+    # Imported on first use
+    assert pb.__version__ == pb.__info__['version']
+    assert pb.load_file is pb.loaders.load_file
+
+    # Submodules are reachable right after import
+    import sys
+    import subprocess
+    code = ('import propertybag as pb\n'
+            'pb.intern.set_default(True)\n'
+            'pb.fingerprint.node()\n'
+            'assert pb.transaction.Transaction\n'
+            'assert "intern" in dir(pb)\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+
+
+def test_18():
+
+    import copy
+
+    # Deeper than the recursion limit
+    _p = pb.Bag()
+    n = _p
+    for i in range(5000):
+        n = n.a
+    n.v = 1
+    _c = _p.deepcopy()
+    assert _p == _c
+    assert _p.deep_equal(_c)
+    s = _c.depth_stats()
+    assert 5001 == s['max_depth']
+    assert 5000 == s['containers']
+    assert 1 == s['leaves']
+    assert 5001 == sum(1 for _ in _p.walk(paths=False))
+    n = _c
+    for i in range(5000):
+        n = n.a
+    n.v = 2
+    assert _p != _c
+    assert not _p.deep_equal(_c)
+
+    # Shared subtrees and cycles
+    s = {'v': [1, {'w': 2}]}
+    d = {'a': s, 'b': s}
+    d['self'] = d
+    _p = pb.Bag(d)
+    _c = _p.deepcopy().as_dict()
+    assert _c['a'] is _c['b']
+    assert _c['self'] is _c
+    assert _c['a'] is not s
+    assert _p.deep_equal(_c)
+    s = _p.depth_stats()
+    assert 1 == s['shared'] and 1 == s['cycles'] and 3 == s['containers']
+    assert ['a', 'a.v', 'a.v.0', 'a.v.1', 'a.v.1.w', 'b', 'self'] == [k for k, v, n in _p.walk('.')]
+
+    # Same results as == and copy.deepcopy()
+    _p = pb.Bag({'a': 1.0, 'b': [1, {'c': None}], 'd': (1, 2)})
+    assert _p.deep_equal({'a': 1, 'b': [1, {'c': None}], 'd': (1, 2)})
+    assert not _p.deep_equal({'a': 1, 'b': (1, {'c': None}), 'd': (1, 2)})
+    assert not _p.deep_equal({'a': 1, 'b': [1, {'c': 0}], 'd': (1, 2)})
+    _c = copy.deepcopy(_p)
+    assert isinstance(_c, pb.Bag) and _c == _p
+    assert _c.b is not _p.b
+    assert copy.copy(_p).as_dict()['b'] is _p.as_dict()['b']
+
+
+
 def main():
     test_1()
     test_2()
     test_3()
     test_4()
     test_5()
+    test_6()
+    test_7()
+    test_8()
+    test_9()
+    test_10()
+    test_11()
+    test_12()
+    test_13()
+    test_14()
+    test_15()
+    test_16()
+    test_17()
+    test_18()
 
 if __name__ == '__main__':
     try: